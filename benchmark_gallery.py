@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from PIL import Image, ImageOps
+import PIL
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource，峰值内存记为 None
+    resource = None
+
+# 合成语料的图片格式与分辨率（分辨率按权重随机抽取，模拟手机照片与高分辨率扫描件混合）
+SYNTHETIC_FORMATS = [("JPEG", "jpg"), ("PNG", "png"), ("JPEG", "jpeg"), ("GIF", "gif")]
+SYNTHETIC_RESOLUTIONS = [((640, 480), 3), ((1920, 1080), 4), ((2480, 3508), 2), ((6000, 4000), 1)]
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GALLERY_SCRIPT = os.path.join(SCRIPT_DIR, "generate_gallery.py")
+
+
+def make_dummy_pdf(title, padding=0):
+    """生成一个只有一页、结构合法的最小PDF，padding 为额外填充的字节数"""
+    content = f"BT /F1 24 Tf 72 720 Td ({title.encode('ascii', 'replace').decode()}) Tj ET\n"
+    content += "%" + "x" * max(0, padding - 1) + "\n" if padding else ""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}endstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def generate_corpus(root, count, seed=0, pdf_kb=64):
+    """在 root 下生成 count 组合成照片及同名PDF，返回照片源文件总字节数"""
+    rng = random.Random(seed)
+    photo_dir = os.path.join(root, "photos")
+    pdf_dir = os.path.join(root, "pdfs")
+    os.makedirs(photo_dir, exist_ok=True)
+    os.makedirs(pdf_dir, exist_ok=True)
+    resolutions = [size for size, _ in SYNTHETIC_RESOLUTIONS]
+    weights = [weight for _, weight in SYNTHETIC_RESOLUTIONS]
+    # 渐变图比随机噪声更接近真实照片的压缩率，也生成得更快
+    gradient = Image.linear_gradient("L")
+    source_bytes = 0
+    for index in range(count):
+        name = f"document-{index:05d}"
+        fmt, ext = SYNTHETIC_FORMATS[index % len(SYNTHETIC_FORMATS)]
+        size = rng.choices(resolutions, weights)[0]
+        colors = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(2)]
+        img = ImageOps.colorize(gradient.rotate(rng.randrange(360)).resize(size), *colors)
+        if fmt == "GIF":
+            img = img.convert("P")
+        photo_path = os.path.join(photo_dir, f"{name}.{ext}")
+        img.save(photo_path, fmt)
+        with open(os.path.join(pdf_dir, f"{name}.pdf"), "wb") as f:
+            f.write(make_dummy_pdf(name, pdf_kb * 1024))
+        source_bytes += os.path.getsize(photo_path)
+    return source_bytes
+
+
+def peak_rss_kb(who):
+    """返回当前进程（self）或已回收子进程（children）的峰值内存（KB）"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # macOS 的 ru_maxrss 单位是字节，Linux 是 KB
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+
+def directory_bytes(path):
+    """统计目录下所有文件的字节数"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def output_bytes(gallery_dir):
+    """按缩略图、PDF、HTML及其他文件分类统计输出字节数"""
+    thumbnails = directory_bytes(os.path.join(gallery_dir, "thumbnails"))
+    pdfs = directory_bytes(os.path.join(gallery_dir, "pdfs"))
+    html = sum(entry.stat().st_size for entry in os.scandir(gallery_dir)
+               if entry.is_file() and entry.name.endswith(".html"))
+    total = directory_bytes(gallery_dir)
+    return {"thumbnails": thumbnails, "pdfs": pdfs, "html": html,
+            "other": total - thumbnails - pdfs - html, "total": total}
+
+
+def timed(func, *args, **kwargs):
+    """执行函数并返回 (耗时秒数, 返回值)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def stage_result(seconds, items):
+    return {"seconds": round(seconds, 4),
+            "items_per_second": round(items / seconds, 2) if seconds > 0 else None}
+
+
+def _child_main(conn, func, args):
+    # 构建过程的提示信息转到标准错误，标准输出只保留 JSON 结果
+    with contextlib.redirect_stdout(sys.stderr):
+        result = func(*args)
+    conn.send(result)
+    conn.close()
+
+
+def run_in_child(func, *args):
+    """在全新的解释器进程中执行函数并返回结果
+
+    Linux 子进程会继承父进程的峰值内存记录，因此生成语料和计时都放到各自的
+    子进程中，使基准进程本身保持很小，测得的峰值内存只反映被测的构建。
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child_main, args=(child_conn, func, args))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        raise RuntimeError(f"基准子进程异常退出（{func.__name__}）")
+    finally:
+        process.join()
+    return result
+
+
+def time_stages(corpus_dir, jobs):
+    """依次计时 create_directories、process_photos（全量与增量）、generate_html 等阶段"""
+    os.chdir(corpus_dir)
+    import generate_gallery
+
+    stages = {}
+    seconds, _ = timed(generate_gallery.create_directories)
+    stages["create_directories"] = {"seconds": round(seconds, 4)}
+    seconds, photo_data = timed(generate_gallery.process_photos, full_rebuild=True, jobs=jobs)
+    count = len(photo_data)
+    stages["process_photos"] = stage_result(seconds, count)
+    seconds, _ = timed(generate_gallery.process_photos, jobs=jobs)
+    stages["process_photos_incremental"] = stage_result(seconds, count)
+    seconds, _ = timed(generate_gallery.generate_html, photo_data)
+    stages["generate_html"] = stage_result(seconds, count)
+    seconds, _ = timed(generate_gallery.build_search_index, photo_data)
+    stages["build_search_index"] = stage_result(seconds, count)
+    generate_gallery.shutdown_process_pools()
+    return {
+        "items": count,
+        "stages": stages,
+        "peak_rss_kb": {"self": peak_rss_kb("self"), "children": peak_rss_kb("children")},
+    }
+
+
+def benchmark_main(corpus_dir, jobs, gallery_args):
+    """以命令行方式端到端运行 generate_gallery.py（含解释器启动），记录耗时与峰值内存"""
+    command = [sys.executable, GALLERY_SCRIPT, "--full-rebuild", "--jobs", str(jobs)] + gallery_args
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=corpus_dir, stdout=subprocess.DEVNULL)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, "waitstatus_to_exitcode") else status
+        peak = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    else:
+        process.wait()
+        peak = None
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"generate_gallery.py 退出码为 {process.returncode}")
+    return {"seconds": round(seconds, 4), "peak_rss_kb": peak}
+
+
+def git_commit():
+    """返回当前提交的哈希，不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=SCRIPT_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(items, jobs=1, seed=0, pdf_kb=64, gallery_args=(), workdir=None, keep=False):
+    """生成合成语料并执行全部基准测试，返回可序列化为 JSON 的结果"""
+    root = tempfile.mkdtemp(prefix="gallery-bench-", dir=workdir)
+    try:
+        seconds, source_bytes = timed(run_in_child, generate_corpus, root, items, seed, pdf_kb)
+        print(f"已生成 {items} 组合成语料（{source_bytes} 字节），用时 {seconds:.2f} 秒", file=sys.stderr)
+        stages = run_in_child(time_stages, root, jobs)
+        outputs = output_bytes(os.path.join(root, "gallery"))
+        main_result = benchmark_main(root, jobs, list(gallery_args))
+        main_result.update(stage_result(main_result["seconds"], stages["items"]))
+        return {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "corpus": {"items": items, "seed": seed, "pdf_kb": pdf_kb, "source_photo_bytes": source_bytes},
+            "jobs": jobs,
+            "gallery_args": list(gallery_args),
+            "items": stages["items"],
+            "stages": stages["stages"],
+            "main": main_result,
+            "peak_rss_kb": stages["peak_rss_kb"],
+            "output_bytes": outputs,
+        }
+    finally:
+        if keep:
+            print(f"语料与输出保留在 {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="生成合成语料并测量 generate_gallery.py 的构建性能")
+    parser.add_argument("--items", "-n", type=int, default=200, help="合成照片/PDF的组数（默认: 200）")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="传给 generate_gallery 的并行进程数（默认: 1）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同语料（默认: 0）")
+    parser.add_argument("--pdf-kb", type=int, default=64, help="每个合成PDF的大小（KB，默认: 64）")
+    parser.add_argument("--gallery-args", default="",
+                        help="端到端运行时额外传给 generate_gallery.py 的参数，如 \"--page-size 50\"")
+    parser.add_argument("--workdir", default=None, help="存放临时语料的目录（默认: 系统临时目录）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的语料和输出")
+    parser.add_argument("--output", "-o", default=None, help="把 JSON 结果写入文件（默认: 输出到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args.items, jobs=args.jobs, seed=args.seed, pdf_kb=args.pdf_kb,
+                           gallery_args=shlex.split(args.gallery_args),
+                           workdir=args.workdir, keep=args.keep)
+    report = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
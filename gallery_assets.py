@@ -0,0 +1,404 @@
+"""画廊页面的静态资源：构建时生成精简样式表与内联SVG图标
+
+样式表只包含页面标记中实际出现的工具类，定义与 Tailwind CSS v3 的同名类一致，
+另加主题色（primary、accent 等）和 hover-lift 等自定义类，页面不再在浏览器里
+运行 Tailwind 编译器。图标取自 templates/icons.svg，只内联页面引用到的 symbol。
+"""
+import re
+
+# 标记中的类名：class 属性，以及脚本里 classList.add/remove/toggle 和 className 赋值的字符串
+CLASS_ATTR_RE = re.compile(r'\bclass="([^"]*)"')
+CLASS_LIST_RE = re.compile(r"classList\.(?:add|remove|toggle)\(([^)]*)\)")
+CLASS_NAME_RE = re.compile(r"className\s*=\s*'([^']*)'")
+ICON_REF_RE = re.compile(r'<use href="#icon-([a-z0-9-]+)"')
+SYMBOL_RE = re.compile(r'<symbol id="icon-([a-z0-9-]+)".*?</symbol>', re.S)
+
+# 主题色沿用原 tailwind.config 中的配置，其余为 Tailwind 默认调色板中用到的颜色
+COLORS = {
+    "primary": "#165DFF",
+    "secondary": "#36BFFA",
+    "dark": "#1D2939",
+    "light": "#F9FAFB",
+    "accent": "#0284C7",
+    "white": "#ffffff",
+    "black": "#000000",
+    "transparent": "transparent",
+    "gray-50": "#f9fafb",
+    "gray-100": "#f3f4f6",
+    "gray-200": "#e5e7eb",
+    "gray-300": "#d1d5db",
+    "gray-400": "#9ca3af",
+    "gray-500": "#6b7280",
+    "gray-600": "#4b5563",
+    "gray-700": "#374151",
+    "gray-800": "#1f2937",
+    "gray-900": "#111827",
+    "red-500": "#ef4444",
+}
+FONT_FAMILY = "Inter,system-ui,sans-serif"
+
+# 响应式前缀（移动优先，按断点从小到大输出）与状态前缀
+BREAKPOINTS = {"sm": 640, "md": 768, "lg": 1024, "xl": 1280, "2xl": 1536}
+STATE_VARIANTS = {"hover": ":hover", "focus": ":focus"}
+
+FONT_SIZES = {
+    "xs": ("0.75rem", "1rem"),
+    "sm": ("0.875rem", "1.25rem"),
+    "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"),
+    "xl": ("1.25rem", "1.75rem"),
+    "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"),
+    "4xl": ("2.25rem", "2.5rem"),
+}
+FONT_WEIGHTS = {"normal": "400", "medium": "500", "semibold": "600", "bold": "700"}
+MAX_WIDTHS = {
+    "xs": "20rem", "sm": "24rem", "md": "28rem", "lg": "32rem", "xl": "36rem", "2xl": "42rem",
+    "3xl": "48rem", "4xl": "56rem", "5xl": "64rem", "6xl": "72rem", "7xl": "80rem", "full": "100%",
+}
+RADII = {"": "0.25rem", "md": "0.375rem", "lg": "0.5rem", "xl": "0.75rem", "full": "9999px"}
+SHADOWS = {
+    "sm": "0 1px 2px 0 rgba(0,0,0,0.05)",
+    "": "0 1px 3px 0 rgba(0,0,0,0.1),0 1px 2px -1px rgba(0,0,0,0.1)",
+    "md": "0 4px 6px -1px rgba(0,0,0,0.1),0 2px 4px -2px rgba(0,0,0,0.1)",
+    "lg": "0 10px 15px -3px rgba(0,0,0,0.1),0 4px 6px -4px rgba(0,0,0,0.1)",
+    "xl": "0 20px 25px -5px rgba(0,0,0,0.1),0 8px 10px -6px rgba(0,0,0,0.1)",
+    "none": "0 0 #0000",
+}
+TRANSFORM = "translate(var(--tw-translate-x),var(--tw-translate-y)) scale(var(--tw-scale-x),var(--tw-scale-y))"
+EASING = "cubic-bezier(0.4,0,0.2,1)"
+TRANSITIONS = {
+    "": "color,background-color,border-color,text-decoration-color,fill,stroke,opacity,box-shadow,transform,filter,backdrop-filter",
+    "all": "all",
+    "colors": "color,background-color,border-color,text-decoration-color,fill,stroke",
+    "opacity": "opacity",
+    "shadow": "box-shadow",
+    "transform": "transform",
+}
+
+# Tailwind preflight 中本页面依赖的部分，外加 transform 类使用的变量默认值
+PREFLIGHT = (
+    "*,::before,::after{box-sizing:border-box;border:0 solid #e5e7eb;"
+    "--tw-translate-x:0;--tw-translate-y:0;--tw-scale-x:1;--tw-scale-y:1}"
+    f"html{{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:{FONT_FAMILY}}}"
+    "body{margin:0;line-height:inherit}"
+    "h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}"
+    "a{color:inherit;text-decoration:inherit}"
+    "b,strong{font-weight:bolder}"
+    "button,input{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;"
+    "color:inherit;margin:0;padding:0}"
+    "button,[type=submit]{-webkit-appearance:button;background-color:transparent;background-image:none}"
+    "button{cursor:pointer}"
+    "[type=search]{-webkit-appearance:textfield;outline-offset:-2px}"
+    "h1,h2,h3,h4,h5,h6,p,ul,ol,figure,blockquote,hr{margin:0}"
+    "ul,ol{list-style:none;padding:0}"
+    "input::placeholder{opacity:1;color:#9ca3af}"
+    "img,svg,video,canvas,embed,object,iframe{display:block;vertical-align:middle}"
+    "img,video{max-width:100%;height:auto}"
+    "[hidden]{display:none}"
+)
+
+# 组件层的类，排在全部工具类之前，便于用 mr-2、text-xl 等工具类调整
+COMPONENTS = {
+    "icon": "display:inline-block;width:1em;height:1em;vertical-align:-0.125em;flex-shrink:0;"
+            "fill:none;stroke:currentColor;stroke-width:2;stroke-linecap:round;stroke-linejoin:round",
+}
+# 固定写法的类，排在带数值的工具类之后并按字典顺序输出（如 hidden 必须排在 flex、grid 之后）
+STATIC_UTILITIES = {
+    "sr-only": "position:absolute;width:1px;height:1px;padding:0;margin:-1px;overflow:hidden;"
+               "clip:rect(0,0,0,0);white-space:nowrap;border-width:0",
+    "static": "position:static",
+    "fixed": "position:fixed",
+    "absolute": "position:absolute",
+    "relative": "position:relative",
+    "sticky": "position:sticky",
+    "block": "display:block",
+    "inline-block": "display:inline-block",
+    "inline": "display:inline",
+    "flex": "display:flex",
+    "inline-flex": "display:inline-flex",
+    "grid": "display:grid",
+    "hidden": "display:none",
+    "flex-1": "flex:1 1 0%",
+    "flex-auto": "flex:1 1 auto",
+    "flex-none": "flex:none",
+    "flex-shrink-0": "flex-shrink:0",
+    "flex-grow": "flex-grow:1",
+    "transform": f"transform:{TRANSFORM}",
+    "animate-bounce": "animation:bounce 1s infinite",
+    "animate-spin": "animation:spin 1s linear infinite",
+    "cursor-pointer": "cursor:pointer",
+    "flex-row": "flex-direction:row",
+    "flex-col": "flex-direction:column",
+    "flex-wrap": "flex-wrap:wrap",
+    "items-start": "align-items:flex-start",
+    "items-end": "align-items:flex-end",
+    "items-center": "align-items:center",
+    "justify-start": "justify-content:flex-start",
+    "justify-end": "justify-content:flex-end",
+    "justify-center": "justify-content:center",
+    "justify-between": "justify-content:space-between",
+    "overflow-auto": "overflow:auto",
+    "overflow-hidden": "overflow:hidden",
+    "truncate": "overflow:hidden;text-overflow:ellipsis;white-space:nowrap",
+    "border": "border-width:1px",
+    "border-0": "border-width:0",
+    "border-2": "border-width:2px",
+    "border-t": "border-top-width:1px",
+    "border-b": "border-bottom-width:1px",
+    "bg-gradient-to-r": "background-image:linear-gradient(to right,var(--tw-gradient-stops))",
+    "bg-gradient-to-b": "background-image:linear-gradient(to bottom,var(--tw-gradient-stops))",
+    "object-contain": "object-fit:contain",
+    "object-cover": "object-fit:cover",
+    "text-left": "text-align:left",
+    "text-center": "text-align:center",
+    "text-right": "text-align:right",
+    "leading-none": "line-height:1",
+    "leading-tight": "line-height:1.25",
+    "leading-normal": "line-height:1.5",
+    "leading-relaxed": "line-height:1.625",
+    "underline": "text-decoration-line:underline",
+    "antialiased": "-webkit-font-smoothing:antialiased;-moz-osx-font-smoothing:grayscale",
+    "outline-none": "outline:2px solid transparent;outline-offset:2px",
+    "backdrop-blur-sm": "-webkit-backdrop-filter:blur(4px);backdrop-filter:blur(4px)",
+    "backdrop-blur": "-webkit-backdrop-filter:blur(8px);backdrop-filter:blur(8px)",
+    # 自定义工具类（原页面 @layer utilities 中的定义）
+    "content-auto": "content-visibility:auto",
+    "text-shadow": "text-shadow:0 2px 4px rgba(0,0,0,0.1)",
+    "hover-lift": "transition:transform 0.3s ease,box-shadow 0.3s ease",
+    "gradient-overlay": "background:linear-gradient(180deg,rgba(0,0,0,0.1) 0%,rgba(0,0,0,0.7) 100%)",
+}
+# 自定义类附带的额外规则：(选择器后缀, 声明)
+STATIC_EXTRA_RULES = {
+    "hover-lift": [(":hover", "transform:translateY(-5px);"
+                              "box-shadow:0 10px 25px -5px rgba(0,0,0,0.1),0 10px 10px -5px rgba(0,0,0,0.04)")],
+}
+KEYFRAMES = {
+    "animate-bounce": "@keyframes bounce{0%,100%{transform:translateY(-25%);animation-timing-function:cubic-bezier(0.8,0,1,1)}"
+                      "50%{transform:none;animation-timing-function:cubic-bezier(0,0,0.2,1)}}",
+    "animate-spin": "@keyframes spin{to{transform:rotate(360deg)}}",
+}
+
+
+def collect_classes(markup):
+    """收集模板或页面标记中出现的全部类名（包括脚本运行时添加的类）"""
+    classes = set()
+    for value in CLASS_ATTR_RE.findall(markup):
+        classes.update(value.split())
+    for args in CLASS_LIST_RE.findall(markup):
+        for value in re.findall(r"'([^']*)'", args):
+            classes.update(value.split())
+    for value in CLASS_NAME_RE.findall(markup):
+        classes.update(value.split())
+    return classes
+
+
+def escape_class(name):
+    """把类名转义为CSS选择器，如 md:flex -> md\\:flex"""
+    return re.sub(r"([^a-zA-Z0-9_-])", r"\\\1", name)
+
+
+def color(name, alpha=None, opacity_var=None):
+    """把调色板中的颜色转成CSS值；alpha 为 0-100 的透明度修饰（如 bg-white/95）"""
+    value = COLORS.get(name)
+    if value is None or value == "transparent" or (alpha is None and opacity_var is None):
+        return value
+    r, g, b = (int(value[i:i + 2], 16) for i in (1, 3, 5))
+    if alpha is not None:
+        return f"rgba({r},{g},{b},{int(alpha) / 100:g})"
+    return f"rgba({r},{g},{b},var({opacity_var},1))"
+
+
+def spacing(value):
+    """间距刻度：n 对应 n×0.25rem，另支持 px、auto、full 和方括号任意值"""
+    if value.startswith("[") and value.endswith("]"):
+        return value[1:-1].replace("_", " ")
+    if value == "px":
+        return "1px"
+    if value == "0":
+        return "0px"
+    if value in ("auto", "full"):
+        return "auto" if value == "auto" else "100%"
+    try:
+        return f"{float(value) * 0.25:g}rem"
+    except ValueError:
+        return None
+
+
+def _negate(value, negative):
+    return f"-{value}" if negative and value not in ("0px", "auto") else value
+
+
+SPACING_PROPERTIES = {
+    "p": ("padding",), "px": ("padding-left", "padding-right"), "py": ("padding-top", "padding-bottom"),
+    "pt": ("padding-top",), "pr": ("padding-right",), "pb": ("padding-bottom",), "pl": ("padding-left",),
+    "m": ("margin",), "mx": ("margin-left", "margin-right"), "my": ("margin-top", "margin-bottom"),
+    "mt": ("margin-top",), "mr": ("margin-right",), "mb": ("margin-bottom",), "ml": ("margin-left",),
+    "inset": ("inset",), "top": ("top",), "right": ("right",), "bottom": ("bottom",), "left": ("left",),
+    "gap": ("gap",), "w": ("width",), "h": ("height",),
+    "min-h": ("min-height",), "max-h": ("max-height",),
+}
+# 间距类在输出中的分组顺序（同组内按类名排序）
+SPACING_ORDER = ("inset", "top", "right", "bottom", "left", "m", "mx", "my", "mt", "mr", "mb", "ml",
+                 "h", "max-h", "min-h", "w", "gap", "p", "px", "py", "pt", "pr", "pb", "pl")
+SPACING_RE = re.compile(r"(-?)(min-h|max-h|inset|top|right|bottom|left|gap|p[xytrbl]?|m[xytrbl]?|w|h)-(.+)")
+
+# 动态类的输出分组，数字越小越靠前；STATIC_UTILITIES 中的类按字典顺序排在同一序列里
+ORDER_Z = 10
+ORDER_SPACING = 20
+ORDER_GRID = 70
+ORDER_SPACE = 80
+ORDER_RADIUS = 90
+ORDER_BORDER_COLOR = 100
+ORDER_BG = 110
+ORDER_GRADIENT = 120
+ORDER_TEXT_SIZE = 140
+ORDER_FONT_WEIGHT = 150
+ORDER_TEXT_COLOR = 160
+ORDER_OPACITY = 170
+ORDER_SHADOW = 180
+ORDER_TRANSITION = 190
+ORDER_DURATION = 200
+ORDER_TRANSFORM = 210
+ORDER_STATIC = 300
+
+
+def utility(name):
+    """把一个不带前缀的工具类解析为 (排序键, 规则列表)，规则为 (选择器后缀, 声明)；不认识的类返回 None"""
+    if name in STATIC_UTILITIES:
+        order = ORDER_STATIC + list(STATIC_UTILITIES).index(name)
+        return order, [("", STATIC_UTILITIES[name])] + STATIC_EXTRA_RULES.get(name, [])
+    if name.startswith("z-"):
+        return ORDER_Z, [("", f"z-index:{name[2:]}")]
+    if name.startswith("max-w-") and name[6:] in MAX_WIDTHS:
+        return ORDER_SPACING + len(SPACING_ORDER), [("", f"max-width:{MAX_WIDTHS[name[6:]]}")]
+    match = re.fullmatch(r"(-?)space-([xy])-(.+)", name)
+    if match:
+        value = spacing(match.group(3))
+        side = "left" if match.group(2) == "x" else "top"
+        return ORDER_SPACE, [(">:not([hidden])~:not([hidden])", f"margin-{side}:{_negate(value, match.group(1))}")]
+    match = SPACING_RE.fullmatch(name)
+    if match:
+        negative, prefix, value = match.groups()
+        if value == "screen":
+            value = "100vw" if prefix == "w" else "100vh"
+        else:
+            value = spacing(value)
+        if value is None:
+            return None
+        declarations = ";".join(f"{prop}:{_negate(value, negative)}" for prop in SPACING_PROPERTIES[prefix])
+        return ORDER_SPACING + SPACING_ORDER.index(prefix), [("", declarations)]
+    match = re.fullmatch(r"grid-cols-(\d+)", name)
+    if match:
+        return ORDER_GRID, [("", f"grid-template-columns:repeat({match.group(1)},minmax(0,1fr))")]
+    match = re.fullmatch(r"rounded(?:-([trbl]))?(?:-(\w+))?", name)
+    if match and (match.group(2) or "") in RADII:
+        radius = RADII[match.group(2) or ""]
+        corners = {
+            None: ("border-radius",),
+            "t": ("border-top-left-radius", "border-top-right-radius"),
+            "r": ("border-top-right-radius", "border-bottom-right-radius"),
+            "b": ("border-bottom-right-radius", "border-bottom-left-radius"),
+            "l": ("border-top-left-radius", "border-bottom-left-radius"),
+        }[match.group(1)]
+        return ORDER_RADIUS, [("", ";".join(f"{corner}:{radius}" for corner in corners))]
+    match = re.fullmatch(r"(bg|text|border|from|to)-([a-z]+(?:-\d+)?)(?:/(\d+))?", name)
+    if match and match.group(2) in COLORS:
+        kind, color_name, alpha = match.groups()
+        if kind == "bg":
+            return ORDER_BG, [("", f"background-color:{color(color_name, alpha, '--tw-bg-opacity')}")]
+        if kind == "text":
+            return ORDER_TEXT_COLOR, [("", f"color:{color(color_name, alpha)}")]
+        if kind == "border":
+            return ORDER_BORDER_COLOR, [("", f"border-color:{color(color_name, alpha)}")]
+        if kind == "from":
+            transparent = color(color_name, 0) if COLORS[color_name] != "transparent" else "transparent"
+            return ORDER_GRADIENT, [("", f"--tw-gradient-from:{color(color_name, alpha)};--tw-gradient-to:{transparent};"
+                                         "--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)")]
+        return ORDER_GRADIENT + 1, [("", f"--tw-gradient-to:{color(color_name, alpha)}")]
+    match = re.fullmatch(r"bg-opacity-(\d+)", name)
+    if match:
+        return ORDER_BG + 1, [("", f"--tw-bg-opacity:{int(match.group(1)) / 100:g}")]
+    match = re.fullmatch(r"text-(\w+)", name)
+    if match and match.group(1) in FONT_SIZES:
+        size, line_height = FONT_SIZES[match.group(1)]
+        return ORDER_TEXT_SIZE, [("", f"font-size:{size};line-height:{line_height}")]
+    if name.startswith("text-[") and name.endswith("]"):
+        return ORDER_TEXT_SIZE, [("", f"font-size:{name[6:-1].replace('_', ' ')}")]
+    match = re.fullmatch(r"font-(\w+)", name)
+    if match and match.group(1) in FONT_WEIGHTS:
+        return ORDER_FONT_WEIGHT, [("", f"font-weight:{FONT_WEIGHTS[match.group(1)]}")]
+    match = re.fullmatch(r"opacity-(\d+)", name)
+    if match:
+        return ORDER_OPACITY, [("", f"opacity:{int(match.group(1)) / 100:g}")]
+    match = re.fullmatch(r"shadow(?:-(\w+))?", name)
+    if match and (match.group(1) or "") in SHADOWS:
+        return ORDER_SHADOW, [("", f"box-shadow:{SHADOWS[match.group(1) or '']}")]
+    match = re.fullmatch(r"transition(?:-(\w+))?", name)
+    if match and (match.group(1) or "") in TRANSITIONS:
+        return ORDER_TRANSITION, [("", f"transition-property:{TRANSITIONS[match.group(1) or '']};"
+                                       f"transition-timing-function:{EASING};transition-duration:150ms")]
+    match = re.fullmatch(r"duration-(\d+)", name)
+    if match:
+        return ORDER_DURATION, [("", f"transition-duration:{match.group(1)}ms")]
+    match = re.fullmatch(r"(-?)translate-([xy])-(.+)", name)
+    if match and spacing(match.group(3)):
+        value = _negate(spacing(match.group(3)), match.group(1))
+        return ORDER_TRANSFORM, [("", f"--tw-translate-{match.group(2)}:{value};transform:{TRANSFORM}")]
+    match = re.fullmatch(r"scale-(\d+)", name)
+    if match:
+        value = f"{int(match.group(1)) / 100:g}"
+        return ORDER_TRANSFORM, [("", f"--tw-scale-x:{value};--tw-scale-y:{value};transform:{TRANSFORM}")]
+    return None
+
+
+def build_stylesheet(classes):
+    """为给定类名生成压缩后的样式表
+
+    输出顺序与 Tailwind 相同：preflight、组件（容器与图标）、无断点前缀的工具类，
+    最后按断点从小到大输出媒体查询；同一分组内状态前缀（hover: 等）的类排在后面。
+    没有对应定义的类（如只供脚本选择元素的 tile、animate-fade-in）直接忽略。
+    """
+    groups = {}
+    keyframes = set()
+    for name in classes:
+        *variants, base = name.split(":")
+        if any(v not in BREAKPOINTS and v not in STATE_VARIANTS for v in variants):
+            continue
+        resolved = utility(base)
+        if resolved is None:
+            continue
+        order, rules = resolved
+        width = max((BREAKPOINTS[v] for v in variants if v in BREAKPOINTS), default=0)
+        states = "".join(STATE_VARIANTS[v] for v in variants if v in STATE_VARIANTS)
+        selector = "." + escape_class(name) + states
+        groups.setdefault(width, []).extend(
+            ((bool(states), order, name), f"{selector}{suffix}{{{declarations}}}") for suffix, declarations in rules)
+        if base in KEYFRAMES:
+            keyframes.add(KEYFRAMES[base])
+    parts = [PREFLIGHT]
+    if "container" in classes:
+        parts.append(".container{width:100%}")
+        parts.extend(f"@media (min-width:{width}px){{.container{{max-width:{width}px}}}}"
+                     for width in sorted(BREAKPOINTS.values()))
+    parts.extend(f".{name}{{{declarations}}}" for name, declarations in COMPONENTS.items() if name in classes)
+    for width, rules in sorted(groups.items()):
+        body = "".join(rule for _, rule in sorted(rules))
+        parts.append(f"@media (min-width:{width}px){{{body}}}" if width else body)
+    parts.extend(sorted(keyframes))
+    return "".join(parts)
+
+
+def icon_sprite(names, source):
+    """从图标集 SVG 源码中挑出指定图标，拼成内联在页面中的隐藏 symbol 雪碧图"""
+    symbols = {match.group(1): match.group(0) for match in SYMBOL_RE.finditer(source)}
+    picked = []
+    for name in sorted(names):
+        if name not in symbols:
+            print(f"警告: 图标集中没有 icon-{name}")
+            continue
+        picked.append(re.sub(r">\s+<", "><", symbols[name]))
+    if not picked:
+        return ""
+    return ('<svg xmlns="http://www.w3.org/2000/svg" aria-hidden="true" '
+            'style="position:absolute;width:0;height:0;overflow:hidden">' + "".join(picked) + "</svg>")
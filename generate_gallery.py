@@ -1,7 +1,62 @@
 import os
 import glob
-from PIL import Image
+import json
+import hashlib
+import io
+import base64
+import re
+import gzip
+import time
+import cProfile
+import argparse
+import threading
+import functools
+import itertools
+import collections
+import subprocess
+import tempfile
+import unicodedata
+from html import escape
+from contextlib import contextmanager
+from string import Template
+from urllib.parse import quote
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageChops, ImageStat, features
 import shutil
+from gallery_assets import ICON_REF_RE, build_stylesheet, collect_classes, icon_sprite
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，reflink 会自动回退
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只生成 .gz
+    brotli = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # 可选依赖，仅在索引PDF正文时需要
+    PdfReader = None
+
+# 可选的PDF渲染库，用于为没有照片的PDF生成封面；都不可用时尝试命令行工具
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+try:
+    import yaml
+except ImportError:  # 可选依赖，仅在使用 gallery.yaml 元数据文件时需要
+    yaml = None
 
 # 配置
 PDF_DIR = "pdfs"
@@ -9,442 +64,1792 @@ PHOTO_DIR = "photos"
 GALLERY_DIR = "gallery"
 THUMBNAIL_DIR = os.path.join(GALLERY_DIR, "thumbnails")
 PDF_DEST_DIR = os.path.join(GALLERY_DIR, "pdfs")
+# 构建状态（清单、缓存、构建报告）单独存放，gallery/ 只包含可直接部署的输出
+STATE_DIR = ".gallery-cache"
+# 照片源文件的扩展名（不区分大小写）；同名照片有多个文件时按此顺序取第一个
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".gif", ".bmp")
+PDF_EXTENSIONS = (".pdf",)
+# 可选的元数据文件（与 photos/、pdfs/ 同级），为项目指定标题、排序和分类，按顺序使用第一个存在的文件
+METADATA_FILES = ("gallery.yaml", "gallery.yml", "gallery.json")
+# 响应式缩略图的宽度（像素），浏览器根据 srcset/sizes 选择最合适的一张
+THUMBNAIL_WIDTHS = (200, 400, 800)
+# 输出格式按优先级排列，本地 Pillow 不支持的格式自动跳过；JPEG 始终作为兜底
+THUMBNAIL_FORMATS = ("avif", "webp", "jpeg")
+THUMBNAIL_FALLBACK_FORMAT = "jpeg"
+# <img> 的默认 src 使用不小于该宽度的 JPEG
+THUMBNAIL_FALLBACK_WIDTH = 400
+# 与卡片网格（grid-cols-1 / md:grid-cols-2 / lg:grid-cols-4）对应的显示宽度
+THUMBNAIL_SIZES = "(min-width: 1024px) 25vw, (min-width: 768px) 50vw, 100vw"
+IMAGE_FORMATS = {
+    "avif": {"pil": "AVIF", "ext": "avif", "mime": "image/avif", "options": {"quality": 60, "speed": 8}},
+    "webp": {"pil": "WEBP", "ext": "webp", "mime": "image/webp", "options": {"quality": 80, "method": 4}},
+    "jpeg": {"pil": "JPEG", "ext": "jpg", "mime": "image/jpeg",
+             "options": {"quality": 85, "optimize": True, "progressive": True}},
+}
+# 占位图：缩略图加载前卡片显示的主色和约 PLACEHOLDER_WIDTH 像素宽的预览图（base64 内联在页面中）
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+# 求主色时先把预览图量化到的颜色数
+PLACEHOLDER_COLORS = 4
+# 缩略图最终缩放使用的重采样滤镜，默认与 Image.thumbnail 一致
+THUMBNAIL_RESAMPLE = "bicubic"
+# 先按整数倍快速缩小（JPEG 由解码器直接缩放），最后一步高质量缩放的倍数不小于该值
+THUMBNAIL_REDUCING_GAP = 2.0
+# 单张图片解码后允许的最大像素数（约 4 字节/像素），超过时拒绝处理以限制内存峰值；0 表示不限制。
+# 按 draft 缩小解码后的尺寸判断，只对无法缩小解码的格式（PNG、WebP 等）生效，大尺寸 JPEG 不受影响
+MAX_DECODE_PIXELS = 64 * 1024 * 1024
+
+# Pillow 9.1 起滤镜常量移入 Image.Resampling
+_Resampling = getattr(Image, "Resampling", Image)
+RESAMPLE_FILTERS = {
+    "nearest": _Resampling.NEAREST,
+    "box": _Resampling.BOX,
+    "bilinear": _Resampling.BILINEAR,
+    "hamming": _Resampling.HAMMING,
+    "bicubic": _Resampling.BICUBIC,
+    "lanczos": _Resampling.LANCZOS,
+}
+
+# PDF 发布方式：copy 为完整复制；hardlink/reflink/symlink 不可用时自动回退
+PDF_PUBLISH_STRATEGY = "copy"
+PUBLISH_FALLBACKS = {
+    "copy": ["copy"],
+    "hardlink": ["hardlink", "copy"],
+    "reflink": ["reflink", "copy_file_range", "copy"],
+    "symlink": ["symlink", "copy"],
+}
+# Linux 的 FICLONE ioctl，在 btrfs/XFS 等文件系统上共享数据块
+FICLONE = 0x40049409
+
+# 页面模板目录（页头、卡片、页尾），以及写出 HTML 时的缓冲区大小
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+HTML_WRITE_BUFFER = 256 * 1024
+# 无限滚动模式下首屏渲染及每次追加的卡片数，以及卡片数据清单的文件名
+INFINITE_BATCH_SIZE = 24
+ITEMS_MANIFEST = "items.json"
+# 分页导航中当前页两侧显示的页码数，以及分页链接、当前页和省略号的样式
+PAGINATION_WINDOW = 2
+PAGINATION_LINK_CLASS = "px-3 py-1 rounded border border-gray-300 text-gray-700 hover:border-primary hover:text-primary transition-colors"
+PAGINATION_CURRENT_CLASS = "px-3 py-1 rounded border border-primary bg-primary text-white"
+PAGINATION_GAP_CLASS = "px-2 text-gray-400"
+INFINITE_SENTINEL = '\n                    <div id="gallery-sentinel" class="h-px"></div>'
+# 构建时生成的样式表：只包含模板中用到的类；页头中 CRITICAL_CSS_END 之前的部分内联为关键CSS
+STYLESHEET_NAME = "gallery.css"
+PAGE_TEMPLATES = ("header.html", "card.html", "category-card.html", "footer.html", "pagination.html",
+                  "infinite-scroll.html")
+CRITICAL_CSS_END = '<div id="main"'
+ICON_SET = "icons.svg"
+_template_cache = {}
+# 列表区的默认标题与说明
+PAGE_HEADING = "文档列表"
+PAGE_INTRO = "点击下方图片查看对应PDF文档，支持在线浏览与下载"
+# 已渲染卡片的缓存，常驻（--watch）时未变化的卡片无需重新渲染；超过上限时整体清空
+CARD_CACHE_LIMIT = 20000
+_card_cache = {}
+
+# 分类分片：项目带分类（photos/、pdfs/ 的子目录或元数据中的 category）时，
+# index.html 为各分类的轻量索引，每个分类单独写出 category-<名称>.html（及其分页）
+CATEGORY_PAGE_PREFIX = "category-"
+UNCATEGORIZED = "其他"
+CATEGORY_INDEX_HEADING = "文档分类"
+CATEGORY_INDEX_INTRO = "选择分类查看其中的PDF文档"
+CATEGORY_BACK_LINK = '\n                        <a href="index.html" class="inline-flex items-center mt-4 text-primary hover:underline">← 全部分类</a>'
+# 页面清单：记录每个分片（首页或一个分类）的内容摘要与输出文件，摘要未变化的分片不再重写
+PAGE_MANIFEST_PATH = os.path.join(STATE_DIR, "page-manifest.json")
+# 站点地图：指定 --site-url 时生成；单个文件最多 SITEMAP_URL_LIMIT 个地址，超过时拆分并写出站点地图索引
+SITEMAP = "sitemap.xml"
+SITEMAP_URL_LIMIT = 50000
+
+# PDF封面：为没有照片的PDF渲染第1页，按PDF内容哈希缓存渲染结果
+COVER_CACHE_DIR = os.path.join(STATE_DIR, "covers")
+COVER_RENDER_WIDTH = max(THUMBNAIL_WIDTHS)
+
+# 搜索索引：标题（及可选的PDF正文）切分为词元后建立倒排表，由页面脚本直接查询
+SEARCH_INDEX = "search-index.json"
+SEARCH_TEXT_CACHE = os.path.join(STATE_DIR, "search-text-cache.json")
+# 提取正文时只读取PDF的前几页
+SEARCH_PDF_PAGES = 3
+# 字母数字词元最多索引到该长度的前缀（整词始终索引），避免长单词使索引按词长平方增长；
+# 写入索引的 prefix_limit 字段，页面脚本据此截断更长的查询词
+SEARCH_PREFIX_LIMIT = 12
+# 中日韩文字连续片段或字母数字连续片段，页面脚本中的 RUNS 需保持一致
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+TOKEN_RUN_RE = re.compile(f"[{_CJK_RANGES}]+|[a-z0-9]+")
+
+# 感知哈希：按照片内容哈希缓存每张源图的 aHash/dHash（各 PHASH_SIZE×PHASH_SIZE 位），并记录相似照片分组
+PHASH_INDEX = os.path.join(STATE_DIR, "phash-index.json")
+PHASH_SIZE = 8
+# aHash 与 dHash 的汉明距离都不超过该值的两张照片视为相似
+PHASH_MAX_DISTANCE = 6
+# 相似照片的处理方式：off 不检测，report 只报告，collapse 每组中PDF相同的项目只保留分辨率最高的一张
+DUPLICATE_MODES = ("off", "report", "collapse")
+DUPLICATE_MODE = "report"
+DUPLICATE_REPORT_LIMIT = 20
+
+# 构建报告：各阶段与各项目的耗时、读写字节数，供 CI 跟踪；--profile 时另存 cProfile 数据
+BUILD_REPORT_PATH = os.path.join(STATE_DIR, "build-report.json")
+PROFILE_PATH = os.path.join(STATE_DIR, "build-profile.prof")
+REPORT_SLOWEST_ITEMS = 10
+_build_report = {"stages": {}, "items": {}}
+_stage_stack = []
+
+# 资源指纹：文件名中加入内容哈希前缀，便于 CDN 设置长期缓存
+FINGERPRINT_LENGTH = 8
+# 预压缩：为顶层的页面和 JSON 清单生成 .gz/.br 同名文件，供静态服务器直接返回
+PRECOMPRESS_SUFFIXES = (".html", ".json", ".css", ".js", ".svg", ".xml")
+PRECOMPRESS_ENCODINGS = (".gz", ".br")
+
+# 监视模式：轮询 photos/、pdfs/ 与模板目录的间隔，以及变化停止多久后才重建（秒）
+WATCH_INTERVAL = 1.0
+WATCH_DEBOUNCE = 0.5
+PREVIEW_PORT = 8000
+# 常驻进程池，按进程数复用，避免每次重建都重新启动工作进程。
+# 提交给进程池的任务函数须定义在模块顶层，出错时通过返回值报告而不抛出异常
+_process_pools = {}
+
+# 增量构建清单：记录源文件指纹、缩略图参数与输出路径
+MANIFEST_PATH = os.path.join(STATE_DIR, "build-manifest.json")
+MANIFEST_VERSION = 1
+
+def reset_build_report():
+    """清空已收集的构建统计，开始新一次构建时调用"""
+    _build_report["stages"].clear()
+    _build_report["items"].clear()
+    del _stage_stack[:]
+
+def record_stage(name, seconds=0.0, bytes_read=0, bytes_written=0, calls=1):
+    """累加一个阶段的耗时与读写字节数"""
+    stage = _build_report["stages"].setdefault(
+        name, {"seconds": 0.0, "calls": 0, "bytes_read": 0, "bytes_written": 0})
+    stage["seconds"] += seconds
+    stage["calls"] += calls
+    stage["bytes_read"] += bytes_read
+    stage["bytes_written"] += bytes_written
+
+def record_bytes(read=0, written=0):
+    """把读写字节数计入当前（最内层）阶段"""
+    if _stage_stack:
+        record_stage(_stage_stack[-1], bytes_read=read, bytes_written=written, calls=0)
+
+def record_item(name, **metrics):
+    """累加单个项目的统计（耗时以 _seconds 结尾，其余为字节数等计数）"""
+    item = _build_report["items"].setdefault(name, {})
+    for key, value in metrics.items():
+        item[key] = item.get(key, 0) + value
+
+@contextmanager
+def build_stage(name):
+    """统计一个构建阶段的耗时，期间 record_bytes 记录的字节数都计入该阶段"""
+    _stage_stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_stack.pop()
+        record_stage(name, time.perf_counter() - start)
+
+def write_build_report(total_seconds, item_count):
+    """把收集到的统计写成 JSON 构建报告，并列出最慢的项目"""
+    stages = {
+        name: dict(stage, seconds=round(stage["seconds"], 4))
+        for name, stage in _build_report["stages"].items()
+    }
+    items = []
+    for name, metrics in _build_report["items"].items():
+        item = {"name": name}
+        item.update((key, round(value, 4) if isinstance(value, float) else value)
+                    for key, value in sorted(metrics.items()))
+        item["seconds"] = round(sum(value for key, value in metrics.items()
+                                    if key in ("thumbnail_seconds", "publish_seconds")), 4)
+        items.append(item)
+    items.sort(key=lambda item: item["seconds"], reverse=True)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "total_seconds": round(total_seconds, 4),
+        "items_published": item_count,
+        "stages": stages,
+        "slowest_items": items[:REPORT_SLOWEST_ITEMS],
+        "items": sorted(items, key=lambda item: item["name"])
+    }
+    with open(BUILD_REPORT_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(BUILD_REPORT_PATH + ".tmp", BUILD_REPORT_PATH)
 
 def create_directories():
     """创建必要的目录"""
     os.makedirs(GALLERY_DIR, exist_ok=True)
     os.makedirs(THUMBNAIL_DIR, exist_ok=True)
     os.makedirs(PDF_DEST_DIR, exist_ok=True)
+    os.makedirs(STATE_DIR, exist_ok=True)
 
-def process_photos():
-    """处理照片，生成缩略图"""
-    photo_files = glob.glob(os.path.join(PHOTO_DIR, "*.[JjPpGg]*"))  # 匹配常见图片格式
-    photo_data = []
+def file_digest(path, chunk_size=1024 * 1024):
+    """分块计算文件内容的 SHA-256 摘要"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+            record_bytes(read=len(chunk))
+    return digest.hexdigest()
+
+def source_record(path, previous=None, st=None):
+    """生成源文件记录，大小和修改时间都未变化时直接沿用上次的内容哈希
+
+    st 为扫描目录时已取得的 stat 结果，省略时重新获取。
+    """
+    if st is None:
+        st = os.stat(path)
+    if (previous and previous.get("size") == st.st_size
+            and previous.get("mtime") == st.st_mtime_ns and previous.get("hash")):
+        digest = previous["hash"]
+    else:
+        digest = file_digest(path)
+    return {"path": path, "size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}
+
+def supported_formats():
+    """返回本地 Pillow 能编码的缩略图格式（按优先级排列）"""
+    formats = []
+    for fmt in THUMBNAIL_FORMATS:
+        if fmt == THUMBNAIL_FALLBACK_FORMAT:
+            supported = True
+        else:
+            try:
+                supported = features.check_module(fmt)
+            except ValueError:
+                # 旧版 Pillow 不认识该模块（如 avif）
+                supported = False
+        if supported:
+            formats.append(fmt)
+    if THUMBNAIL_FALLBACK_FORMAT not in formats:
+        formats.append(THUMBNAIL_FALLBACK_FORMAT)
+    return formats
+
+def thumbnail_settings(resample=THUMBNAIL_RESAMPLE, fingerprint=False):
+    """当前缩略图参数，参数变化时所有缩略图都需要重建"""
+    return {
+        "widths": list(THUMBNAIL_WIDTHS),
+        "formats": supported_formats(),
+        "resample": resample,
+        "reducing_gap": THUMBNAIL_REDUCING_GAP,
+        "placeholder_width": PLACEHOLDER_WIDTH,
+        "fingerprint": fingerprint
+    }
+
+def fingerprinted(path, digest, fingerprint=True):
+    """在扩展名前插入内容哈希前缀，如 name-400.webp -> name-400.3f9a1c2b.webp"""
+    if not fingerprint:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+def output_paths(entry):
+    """列出清单条目的全部输出路径（相对于 GALLERY_DIR）"""
+    for value in entry.get("outputs", {}).values():
+        if isinstance(value, list):
+            yield from value
+        else:
+            yield value
+
+def load_manifest():
+    """读取上次构建的清单，不存在或格式不符时返回空清单"""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("items", {})
+
+def save_manifest(items):
+    """原子地写入构建清单，避免中断时留下损坏的文件"""
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "items": items}, f,
+                  ensure_ascii=False, indent=2, sort_keys=True)
+    record_bytes(written=os.path.getsize(tmp_path))
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def is_up_to_date(entry, photo, pdf, settings):
+    """判断清单条目与当前源文件、参数和输出是否一致"""
+    if not entry:
+        return False
+    if entry.get("photo", {}).get("hash") != photo["hash"]:
+        return False
+    if entry.get("pdf", {}).get("hash") != pdf["hash"]:
+        return False
+    if entry.get("thumbnail_settings") != settings:
+        return False
+    return all(os.path.exists(os.path.join(GALLERY_DIR, path)) for path in output_paths(entry))
+
+def remove_stale_outputs(previous_items, current_items):
+    """删除源文件已不存在（或输出路径已变化）的旧输出"""
+    keep = {path for entry in current_items.values() for path in output_paths(entry)}
+    for entry in previous_items.values():
+        for path in output_paths(entry):
+            if path in keep:
+                continue
+            full_path = os.path.join(GALLERY_DIR, path)
+            if os.path.lexists(full_path):
+                os.remove(full_path)
+                print(f"已删除过期文件: {full_path}")
+
+def _publish_copy(src, dest):
+    shutil.copy2(src, dest)
+
+def _publish_hardlink(src, dest):
+    os.link(src, dest)
+
+def _publish_symlink(src, dest):
+    target = os.path.relpath(os.path.abspath(src), os.path.dirname(os.path.abspath(dest)))
+    os.symlink(target, dest)
+
+def _publish_reflink(src, dest):
+    if fcntl is None:
+        raise OSError("当前平台不支持 reflink")
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dest)
+
+def _publish_copy_file_range(src, dest):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("当前平台不支持 copy_file_range")
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdest.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src, dest)
+
+PUBLISH_METHODS = {
+    "copy": _publish_copy,
+    "hardlink": _publish_hardlink,
+    "symlink": _publish_symlink,
+    "reflink": _publish_reflink,
+    "copy_file_range": _publish_copy_file_range,
+}
+_publish_warned = set()
+
+def is_published(src, dest, strategy):
+    """目标已是源文件的链接，或大小和修改时间都与源文件一致时无需重新发布"""
+    if not os.path.lexists(dest):
+        return False
+    if strategy == "symlink" and os.path.islink(dest):
+        return os.path.realpath(dest) == os.path.realpath(src)
+    if os.path.islink(dest):
+        return False
+    src_stat = os.stat(src)
+    dest_stat = os.lstat(dest)
+    if (src_stat.st_dev, src_stat.st_ino) == (dest_stat.st_dev, dest_stat.st_ino):
+        return True
+    return src_stat.st_size == dest_stat.st_size and src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+def is_pdf_current(entry, pdf, dest, strategy):
+    """清单记录的PDF内容哈希和发布方式都未变、目标仍在且大小一致时，PDF无需重新发布
+
+    不比较源文件的修改时间：CI 检出会刷新所有文件的修改时间，而内容哈希不变。
+    """
+    return (entry.get("publish") == strategy and entry.get("pdf", {}).get("hash") == pdf["hash"]
+            and os.path.isfile(dest) and os.path.getsize(dest) == pdf["size"])
+
+def publish_file(src, dest, strategy=PDF_PUBLISH_STRATEGY, force=False):
+    """按发布方式把源文件放到目标位置，返回实际使用的方式（已是最新时返回 None）
+
+    依次尝试该方式的回退链，某种方式不受支持时改用下一种。force 为 True 时
+    （如发布方式改变）即使目标已是最新也重新发布。
+    """
+    if not force and is_published(src, dest, strategy):
+        return None
+    methods = PUBLISH_FALLBACKS[strategy]
+    for index, method in enumerate(methods):
+        # 先删除旧目标，避免写穿旧的硬链接改动源文件
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            PUBLISH_METHODS[method](src, dest)
+            if method in ("copy", "copy_file_range"):
+                size = os.path.getsize(dest)
+                record_bytes(read=size, written=size)
+            return method
+        except OSError as e:
+            if index == len(methods) - 1:
+                raise
+            if method not in _publish_warned:
+                _publish_warned.add(method)
+                print(f"提示: 无法使用 {method} 发布文件（{e}），改用 {methods[index + 1]}")
+    return None
+
+def open_reduced(img, width, reducing_gap, max_pixels):
+    """让解码器尽量在接近目标宽度的分辨率上工作，max_pixels 大于 0 时限制解码后的像素数
+
+    JPEG 通过 draft 在解码时按 1/2、1/4、1/8 缩放；其他格式无法缩小解码，会以原尺寸
+    完整解码（resize 中的 reduce 发生在解码之后），因此像素数上限实际只约束这些格式。
+    """
+    if reducing_gap:
+        img.draft(None, (int(width * reducing_gap), 1))
+    if max_pixels and img.width * img.height > max_pixels:
+        raise ValueError(f"解码尺寸 {img.width}x{img.height} 超过上限 {max_pixels} 像素")
+
+def _render_with_fitz(pdf_path, cover_path, width):
+    with fitz.open(pdf_path) as doc:
+        page = doc[0]
+        zoom = width / page.rect.width
+        page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).save(cover_path)
+
+def _render_with_pdfium(pdf_path, cover_path, width):
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        page = pdf[0]
+        page.render(scale=width / page.get_width()).to_pil().save(cover_path, "PNG")
+    finally:
+        pdf.close()
+
+def _render_with_pdftoppm(pdf_path, cover_path, width):
+    prefix = os.path.splitext(cover_path)[0]
+    subprocess.run(["pdftoppm", "-png", "-f", "1", "-l", "1", "-singlefile",
+                    "-scale-to-x", str(width), "-scale-to-y", "-1", pdf_path, prefix],
+                   check=True, capture_output=True)
+    if prefix + ".png" != cover_path:
+        os.replace(prefix + ".png", cover_path)
+
+def _render_with_mutool(pdf_path, cover_path, width):
+    subprocess.run(["mutool", "draw", "-q", "-o", cover_path, "-w", str(width), pdf_path, "1"],
+                   check=True, capture_output=True)
+
+PDF_RASTERIZERS = [
+    ("pymupdf", lambda: fitz is not None, _render_with_fitz),
+    ("pypdfium2", lambda: pypdfium2 is not None, _render_with_pdfium),
+    ("pdftoppm", lambda: shutil.which("pdftoppm") is not None, _render_with_pdftoppm),
+    ("mutool", lambda: shutil.which("mutool") is not None, _render_with_mutool),
+]
+
+def find_rasterizer():
+    """返回第一个可用的PDF渲染方式名称，没有时返回 None"""
+    for name, available, _ in PDF_RASTERIZERS:
+        if available():
+            return name
+    return None
+
+def render_pdf_cover(pdf_path, cover_path, rasterizer, width=COVER_RENDER_WIDTH):
+    """把PDF第1页渲染为PNG封面（经临时文件原子替换），成功返回 None，失败返回错误信息"""
+    render = {name: func for name, _, func in PDF_RASTERIZERS}[rasterizer]
+    fd, tmp_path = tempfile.mkstemp(suffix=".png", dir=os.path.dirname(cover_path))
+    os.close(fd)
+    try:
+        render(pdf_path, tmp_path, width)
+        os.replace(tmp_path, cover_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return str(e)
+    return None
+
+def render_pdf_covers(tasks, jobs=1):
+    """为需要封面的PDF批量渲染第1页，按任务顺序返回错误信息（成功为 None）"""
+    if not tasks:
+        return []
+    rasterizer = find_rasterizer()
+    if rasterizer is None:
+        return ["未找到可用的PDF渲染工具（PyMuPDF、pypdfium2、pdftoppm 或 mutool）"] * len(tasks)
+    os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+    pdf_paths = [task["pdf_path"] for task in tasks]
+    cover_paths = [task["photo_path"] for task in tasks]
+    rasterizers = [rasterizer] * len(tasks)
+    workers = resolve_jobs(jobs)
+    if workers == 1 or len(tasks) == 1:
+        return list(map(render_pdf_cover, pdf_paths, cover_paths, rasterizers))
+    return pool_map(workers, render_pdf_cover, pdf_paths, cover_paths, rasterizers)
+
+def prune_cover_cache(used_paths):
+    """删除缓存中不再被任何项目使用的封面"""
+    if not os.path.isdir(COVER_CACHE_DIR):
+        return
+    used = {os.path.abspath(path) for path in used_paths}
+    for entry in os.scandir(COVER_CACHE_DIR):
+        if entry.is_file() and os.path.abspath(entry.path) not in used:
+            os.remove(entry.path)
+
+def target_widths(source_width, widths):
+    """不放大图片：只保留不超过原图宽度的尺寸，原图过小时输出原尺寸"""
+    fitting = [w for w in widths if w <= source_width]
+    return fitting or [source_width]
+
+def make_placeholder(img, settings):
+    """从已解码的图片生成占位图：量化后出现最多的颜色，以及 base64 编码的极小预览图"""
+    width = settings["placeholder_width"]
+    height = max(1, round(img.height * width / img.width))
+    preview = img.resize((width, height), Image.BOX, reducing_gap=settings["reducing_gap"]).convert("RGB")
+    quantized = preview.quantize(PLACEHOLDER_COLORS)
+    _, index = max(quantized.getcolors())
+    color = "#" + bytes(quantized.getpalette()[index * 3:index * 3 + 3]).hex()
+    spec = IMAGE_FORMATS["webp" if "webp" in settings["formats"] else THUMBNAIL_FALLBACK_FORMAT]
+    buffer = io.BytesIO()
+    preview.save(buffer, spec["pil"], quality=PLACEHOLDER_QUALITY)
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return {"color": color, "preview": f"data:{spec['mime']};base64,{data}"}
+
+def make_thumbnail(photo_path, thumbnail_base, settings, max_pixels=MAX_DECODE_PIXELS, phash=False):
+    """只解码一次，为一张照片生成全部宽度与格式的缩略图和占位图（phash 为 True 时还有感知哈希）
+
+    返回 error（成功为 None）、variants、placeholder、phash、各步骤耗时 timings 及读写字节数。
+    """
+    result = {"error": None, "variants": [], "placeholder": None, "phash": None, "timings": {},
+              "bytes_read": 0, "bytes_written": 0}
+    timings = result["timings"]
     
-    for photo_path in photo_files:
-        # 获取文件名（不含扩展名）
-        photo_name = os.path.splitext(os.path.basename(photo_path))[0]
-        
-        # 查找对应的PDF文件（假设PDF文件名与照片名相同）
-        pdf_path = os.path.join(PDF_DIR, f"{photo_name}.pdf")
-        if not os.path.exists(pdf_path):
-            print(f"警告: 未找到 {photo_name} 对应的PDF文件")
+    def lap(key, start):
+        timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+        return time.perf_counter()
+    
+    try:
+        start = time.perf_counter()
+        with Image.open(photo_path) as img:
+            source_width, source_height = img.size
+            widths = target_widths(source_width, settings["widths"])
+            open_reduced(img, max(widths), settings["reducing_gap"], max_pixels)
+            img.load()
+            base = img if img.mode in ("RGB", "RGBA", "L", "LA") else img.convert("RGB")
+            start = lap("decode", start)
+            result["placeholder"] = make_placeholder(base, settings)
+            start = lap("placeholder", start)
+            if phash:
+                result["phash"] = image_hashes(base, source_width, source_height)
+                start = lap("phash", start)
+            for width in widths:
+                # 保持比例，按宽度缩放
+                height = max(1, round(source_height * width / source_width))
+                resized = base.resize((width, height), RESAMPLE_FILTERS[settings["resample"]],
+                                      reducing_gap=settings["reducing_gap"]).convert("RGB")
+                start = lap("resize", start)
+                for fmt in settings["formats"]:
+                    spec = IMAGE_FORMATS[fmt]
+                    buffer = io.BytesIO()
+                    resized.save(buffer, spec["pil"], **spec["options"])
+                    data = buffer.getvalue()
+                    start = lap(f"encode_{fmt}", start)
+                    path = fingerprinted(f"{thumbnail_base}-{width}.{spec['ext']}",
+                                         hashlib.sha256(data).hexdigest(), settings.get("fingerprint"))
+                    # 先写临时文件再替换，不会写穿与其他项目共享的硬链接
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(path + ".tmp", path)
+                    result["bytes_written"] += len(data)
+                    result["variants"].append({
+                        "format": fmt,
+                        "width": width,
+                        "height": height,
+                        "path": os.path.relpath(path, GALLERY_DIR)
+                    })
+        result["bytes_read"] = os.path.getsize(photo_path)
+    except Exception as e:
+        result["error"] = str(e)
+        result["variants"] = []
+        result["placeholder"] = None
+        result["phash"] = None
+    return result
+
+def process_pool(workers):
+    """返回指定进程数的常驻进程池，不存在时创建"""
+    pool = _process_pools.get(workers)
+    if pool is None:
+        pool = _process_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+def discard_process_pool(workers):
+    """丢弃已损坏的进程池，下次使用时重建"""
+    pool = _process_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+def pool_map(workers, func, *iterables, chunksize=1):
+    """在常驻进程池中按提交顺序执行任务；进程池损坏时丢弃，下次使用时重建"""
+    try:
+        return list(process_pool(workers).map(func, *iterables, chunksize=chunksize))
+    except BrokenProcessPool:
+        discard_process_pool(workers)
+        raise
+
+def shutdown_process_pools():
+    """关闭全部常驻进程池"""
+    for pool in _process_pools.values():
+        pool.shutdown()
+    _process_pools.clear()
+
+def resolve_jobs(jobs):
+    """将 --jobs 参数转换为实际的进程数，0 表示使用全部 CPU 核心"""
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+def run_thumbnail_jobs(tasks, settings, jobs=1, max_pixels=MAX_DECODE_PIXELS, phash=False):
+    """批量生成缩略图，按任务顺序逐个产出 (任务, make_thumbnail 结果)
+
+    tasks 可以是生成器：jobs 大于 1 时每取到一个任务就提交到进程池，
+    上游扫描与缩略图生成同时进行；否则在当前进程中串行处理。
+    """
+    workers = resolve_jobs(jobs)
+    if workers == 1:
+        for task in tasks:
+            yield task, make_thumbnail(task["photo_path"], task["thumbnail_base"], settings, max_pixels, phash)
+        return
+    pool = process_pool(workers)
+    pending = collections.deque()
+    try:
+        for task in tasks:
+            pending.append((task, pool.submit(make_thumbnail, task["photo_path"], task["thumbnail_base"],
+                                              settings, max_pixels, phash)))
+            # 队首已完成的结果及时交出，不必等到全部任务提交完
+            while pending and pending[0][1].done():
+                task, future = pending.popleft()
+                yield task, future.result()
+        while pending:
+            task, future = pending.popleft()
+            yield task, future.result()
+    except BrokenProcessPool:
+        discard_process_pool(workers)
+        raise
+
+def fallback_variant(variants):
+    """选出作为 <img src> 的 JPEG 缩略图：不小于默认宽度中最小的一张，否则取最大的一张"""
+    jpegs = sorted((v for v in variants if v["format"] == THUMBNAIL_FALLBACK_FORMAT),
+                   key=lambda v: v["width"])
+    for variant in jpegs:
+        if variant["width"] >= THUMBNAIL_FALLBACK_WIDTH:
+            return variant
+    return jpegs[-1]
+
+def image_hashes(img, width, height):
+    """从已解码的图片计算 aHash 与 dHash（十六进制），附带原始尺寸 width、height
+
+    先缩小到 PHASH_SIZE 量级的灰度图，再用 Pillow 的整图运算一次得出全部比特：
+    aHash 为各像素是否高于均值，dHash 为各像素是否比左侧相邻像素亮。
+    """
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("L")
+    small = img.resize((PHASH_SIZE + 1, PHASH_SIZE), Image.BOX).convert("L")
+    average = img.resize((PHASH_SIZE, PHASH_SIZE), Image.BOX).convert("L")
+    mean = ImageStat.Stat(average).mean[0]
+    ahash = average.point(lambda v: 255 if v > mean else 0, "1")
+    gradient = ImageChops.subtract(small.crop((1, 0, PHASH_SIZE + 1, PHASH_SIZE)),
+                                   small.crop((0, 0, PHASH_SIZE, PHASH_SIZE)))
+    dhash = gradient.point(lambda v: 255 if v else 0, "1")
+    return {"ahash": ahash.tobytes().hex(), "dhash": dhash.tobytes().hex(), "width": width, "height": height}
+
+def perceptual_hash(photo_path, max_pixels=MAX_DECODE_PIXELS):
+    """单独解码照片并计算感知哈希（见 image_hashes），出错时返回 error"""
+    try:
+        with Image.open(photo_path) as img:
+            width, height = img.size
+            open_reduced(img, PHASH_SIZE * 8, THUMBNAIL_REDUCING_GAP, max_pixels)
+            return image_hashes(img, width, height)
+    except Exception as e:
+        return {"error": str(e)}
+
+def load_phash_index():
+    """读取感知哈希索引，不存在或格式不符时返回空索引"""
+    try:
+        with open(PHASH_INDEX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return index.get("hashes", {}) if isinstance(index, dict) else {}
+
+def perceptual_hashes(items, jobs=1, max_pixels=MAX_DECODE_PIXELS):
+    """返回照片内容哈希到感知哈希的映射
+
+    索引中已有的照片，以及生成缩略图时已顺带算出感知哈希（item["phash"]）的照片不再解码。
+    """
+    cache = load_phash_index()
+    missing = {}
+    for item in items:
+        digest = item["photo_record"]["hash"]
+        if digest in cache:
             continue
-        
-        # 生成缩略图
-        thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{photo_name}.jpg")
+        if item.get("phash"):
+            cache[digest] = item["phash"]
+        else:
+            missing.setdefault(digest, item["photo_path"])
+    paths = list(missing.values())
+    workers = resolve_jobs(jobs)
+    if workers == 1 or len(paths) <= 1:
+        results = list(map(perceptual_hash, paths, [max_pixels] * len(paths)))
+    else:
+        results = pool_map(workers, perceptual_hash, paths, [max_pixels] * len(paths),
+                           chunksize=max(1, len(paths) // (workers * 4)))
+    for (digest, path), result in zip(missing.items(), results):
+        if "error" in result:
+            print(f"计算图片 {path} 的感知哈希时出错: {result['error']}")
+        else:
+            cache[digest] = result
+    return {item["photo_record"]["hash"]: cache[item["photo_record"]["hash"]]
+            for item in items if item["photo_record"]["hash"] in cache}
+
+def duplicate_groups(items, hashes, max_distance=PHASH_MAX_DISTANCE):
+    """找出 aHash 与 dHash 汉明距离都不超过 max_distance 的相似照片组
+
+    dHash 被切成 max_distance + 1 段，距离不超过阈值的两张照片至少有一段完全相同，
+    因此只比较落在同一分段桶里的候选对，不需要两两比较。纯色图片的哈希全为 0，
+    没有区分度，不参与比较。
+    """
+    bits = PHASH_SIZE * PHASH_SIZE
+    values = {}
+    for index, item in enumerate(items):
+        entry = hashes.get(item["photo_record"]["hash"])
+        if entry and (int(entry["ahash"], 16) or int(entry["dhash"], 16)):
+            values[index] = (int(entry["ahash"], 16), int(entry["dhash"], 16))
+    bands = max_distance + 1
+    bounds = [bits * band // bands for band in range(bands + 1)]
+    buckets = {}
+    for index, (_, dhash) in values.items():
+        for band in range(bands):
+            segment = (dhash >> bounds[band]) & ((1 << (bounds[band + 1] - bounds[band])) - 1)
+            buckets.setdefault((band, segment), []).append(index)
+    
+    parent = {index: index for index in values}
+    
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+    
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                root_i, root_j = find(i), find(j)
+                if root_i == root_j:
+                    continue
+                if (bin(values[i][0] ^ values[j][0]).count("1") <= max_distance
+                        and bin(values[i][1] ^ values[j][1]).count("1") <= max_distance):
+                    parent[root_j] = root_i
+    groups = {}
+    for index in sorted(values):
+        groups.setdefault(find(index), []).append(items[index])
+    return [group for group in groups.values() if len(group) > 1]
+
+def resolve_duplicates(items, hashes, mode=DUPLICATE_MODE):
+    """报告相似照片组并写出感知哈希索引，返回保留下来的项目列表
+
+    mode 为 collapse 时，组内PDF也相同的项目只保留分辨率最高的一张；PDF不同的项目
+    都保留，否则其文档会从页面、搜索索引和站点地图中消失。
+    """
+    groups = duplicate_groups(items, hashes)
+    removed = set()
+    for number, group in enumerate(groups):
+        names = "、".join(item["name"] for item in group)
+        note = ""
+        if mode == "collapse":
+            by_pdf = {}
+            for item in group:
+                by_pdf.setdefault(item["pdf_record"]["hash"], []).append(item)
+            keepers = [min(members, key=lambda item: (-hashes[item["photo_record"]["hash"]]["width"]
+                                                       * hashes[item["photo_record"]["hash"]]["height"],
+                                                       item["name"]))
+                       for members in by_pdf.values()]
+            kept = [item["name"] for item in keepers]
+            removed.update(item["name"] for item in group if item["name"] not in kept)
+            note = f"（保留 {'、'.join(kept)}）"
+        if number < DUPLICATE_REPORT_LIMIT:
+            print(f"相似照片: {names}{note}")
+    if len(groups) > DUPLICATE_REPORT_LIMIT:
+        print(f"……另有 {len(groups) - DUPLICATE_REPORT_LIMIT} 组相似照片，完整列表见 {PHASH_INDEX}")
+    index = {
+        "hashes": {digest: hashes[digest] for digest in sorted(hashes)},
+        "duplicates": [[item["name"] for item in group] for group in groups]
+    }
+    with open(PHASH_INDEX + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(PHASH_INDEX + ".tmp", PHASH_INDEX)
+    return [item for item in items if item["name"] not in removed]
+
+def share_thumbnails(variants, source_base, thumbnail_base):
+    """把内容相同的照片已生成的缩略图以硬链接（不支持时复制）提供给另一项目，返回其变体列表"""
+    shared = []
+    for variant in variants:
+        src = os.path.join(GALLERY_DIR, variant["path"])
+        dest = thumbnail_base + src[len(source_base):]
+        publish_file(src, dest, "hardlink")
+        shared.append(dict(variant, path=os.path.relpath(dest, GALLERY_DIR)))
+    return shared
+
+def pdf_cover_items(pdf_entries, previous_items, settings, full_rebuild=False, jobs=1):
+    """为没有对应照片的PDF（扫描得到的 (名称, DirEntry) 列表）渲染第1页作为照片源
+
+    封面按PDF内容哈希缓存在 COVER_CACHE_DIR，PDF未变化时不会重新渲染。
+    """
+    items = []
+    for name, entry in pdf_entries:
+        previous = previous_items.get(name, {})
+        pdf_record = source_record(entry.path, previous.get("pdf"), entry.stat())
+        items.append({
+            "name": name,
+            "photo_path": os.path.join(COVER_CACHE_DIR, f"{pdf_record['hash']}.png"),
+            "pdf_path": entry.path,
+            "thumbnail_base": os.path.join(THUMBNAIL_DIR, name),
+            "dest_pdf_path": fingerprinted(os.path.join(PDF_DEST_DIR, f"{name}.pdf"),
+                                           pdf_record["hash"], settings["fingerprint"]),
+            "pdf_record": pdf_record,
+            "previous": previous
+        })
+    
+    renders = [item for item in items if not os.path.exists(item["photo_path"])]
+    failed = set()
+    for task, error in zip(renders, render_pdf_covers(renders, jobs)):
+        if error is not None:
+            print(f"渲染PDF {task['pdf_path']} 封面时出错: {error}")
+            failed.add(task["name"])
+    
+    ready = []
+    for item in items:
+        if item["name"] in failed:
+            continue
+        previous = item.pop("previous")
+        item["photo_record"] = source_record(item["photo_path"], previous.get("photo"))
+        item["stale"] = full_rebuild or not is_up_to_date(previous, item["photo_record"],
+                                                          item["pdf_record"], settings)
+        item["variants"] = previous.get("thumbnails", [])
+        item["placeholder"] = previous.get("placeholder")
+        ready.append(item)
+    return ready
+
+def scan_directory(directory, extensions):
+    """用 os.scandir 遍历目录及其一级子目录（每个目录一次），返回 {名称: DirEntry}
+
+    名称为不含扩展名的文件名，子目录中的文件为“子目录/文件名”，子目录名即项目的分类。
+    扩展名不区分大小写；同名文件有多个可用扩展名时按 extensions 中的顺序取第一个。
+    """
+    index = {}
+    pending = [(directory, "")]
+    while pending:
+        path, prefix = pending.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if not prefix and entry.is_dir():
+                    pending.append((entry.path, entry.name + "/"))
+                    continue
+                name, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                if ext not in extensions or not entry.is_file():
+                    continue
+                name = prefix + name
+                current = index.get(name)
+                if current is not None:
+                    current_ext = os.path.splitext(current.name)[1].lower()
+                    if extensions.index(current_ext) <= extensions.index(ext):
+                        print(f"警告: {directory} 中 {name} 有多个文件，忽略 {entry.name}")
+                        continue
+                    print(f"警告: {directory} 中 {name} 有多个文件，忽略 {current.name}")
+                index[name] = entry
+    return index
+
+def load_metadata():
+    """读取可选的元数据文件，返回 {项目名: 元数据}，没有元数据文件时返回空字典
+
+    文件为 YAML（需要 PyYAML）或 JSON。文件存在却无法读取（未安装 PyYAML、解析失败、
+    缺少 items 映射）时抛出 RuntimeError，而不是忽略其中的全部标题、排序和分类。
+    格式如下，各字段均可省略：
+
+        items:
+          项目名:
+            title: 显示标题（默认使用文件名）
+            order: 排序值（数字，越小越靠前；未指定的项目按名称排在后面）
+            category: 分类
+    """
+    for path in METADATA_FILES:
+        if not os.path.exists(path):
+            continue
+        if path.endswith(".json"):
+            loader = json.load
+        elif yaml is not None:
+            loader = yaml.safe_load
+        else:
+            raise RuntimeError(f"读取元数据文件 {path} 需要 PyYAML，请先安装: pip install pyyaml")
         try:
-            with Image.open(photo_path) as img:
-                # 保持比例缩放，最大宽度/高度为300
-                img.thumbnail((300, 300))
-                img.convert('RGB').save(thumbnail_path, "JPEG")
+            with open(path, "r", encoding="utf-8") as f:
+                data = loader(f) or {}
         except Exception as e:
-            print(f"处理图片 {photo_path} 时出错: {e}")
+            raise RuntimeError(f"读取元数据文件 {path} 时出错: {e}") from e
+        items = data.get("items") if isinstance(data, dict) else None
+        if not isinstance(items, dict):
+            raise RuntimeError(f"元数据文件 {path} 缺少 items 映射")
+        metadata = {}
+        for name, meta in items.items():
+            if not isinstance(meta, dict):
+                continue
+            order = meta.get("order")
+            if order is not None and (isinstance(order, bool) or not isinstance(order, (int, float))):
+                print(f"警告: {path} 中 {name} 的 order 不是数字，已忽略")
+                order = None
+            metadata[str(name)] = {
+                "title": str(meta["title"]) if meta.get("title") else None,
+                "order": order,
+                "category": str(meta["category"]) if meta.get("category") else None
+            }
+        return metadata
+    return {}
+
+def iter_photo_items(photo_index, pdf_index, previous_items, settings, full_rebuild=False):
+    """按名称顺序逐个产出照片与同名PDF配对后的工作项
+
+    配对只查内存中的 name→entry 索引；源文件记录（必要时计算内容哈希）在产出时才生成，
+    下游的缩略图进程池因此可以在扫描结束前就开始工作。
+    """
+    for name in sorted(photo_index):
+        pdf_entry = pdf_index.get(name)
+        if pdf_entry is None:
+            print(f"警告: 未找到 {name} 对应的PDF文件")
             continue
+        photo_entry = photo_index[name]
+        previous = previous_items.get(name, {})
+        photo_record = source_record(photo_entry.path, previous.get("photo"), photo_entry.stat())
+        pdf_record = source_record(pdf_entry.path, previous.get("pdf"), pdf_entry.stat())
+        yield {
+            "name": name,
+            "photo_path": photo_entry.path,
+            "pdf_path": pdf_entry.path,
+            "thumbnail_base": os.path.join(THUMBNAIL_DIR, name),
+            "dest_pdf_path": fingerprinted(os.path.join(PDF_DEST_DIR, f"{name}.pdf"),
+                                           pdf_record["hash"], settings["fingerprint"]),
+            "photo_record": photo_record,
+            "pdf_record": pdf_record,
+            "stale": full_rebuild or not is_up_to_date(previous, photo_record, pdf_record, settings),
+            "variants": previous.get("thumbnails", []),
+            "placeholder": previous.get("placeholder")
+        }
+
+def process_photos(full_rebuild=False, jobs=1, resample=THUMBNAIL_RESAMPLE,
+                   max_pixels=MAX_DECODE_PIXELS, publish=PDF_PUBLISH_STRATEGY,
+                   pdf_covers=False, fingerprint=False, duplicates=DUPLICATE_MODE):
+    """处理照片，生成缩略图
+
+    借助构建清单增量处理：未变化的项目直接跳过，变化的项目重建，
+    源文件被删除的项目清理其输出。full_rebuild 为 True 时忽略清单全部重建；
+    jobs 控制生成缩略图的并行进程数，resample 为最终缩放使用的滤镜，
+    max_pixels 大于 0 时限制单张图片解码后的像素数，publish 为PDF的发布方式。
+    pdf_covers 为 True 时还会为没有照片的PDF渲染第1页作为封面；
+    fingerprint 为 True 时缩略图和PDF的文件名带内容哈希；duplicates 为相似照片的
+    处理方式（见 DUPLICATE_MODES）。内容完全相同的照片只编码一次，共享缩略图。
+    
+    照片与PDF各扫描一次目录后在内存中配对，工作项以生成器逐个交给缩略图阶段；
+    可选的元数据文件（见 load_metadata）决定标题、分类和排列顺序，
+    没有指定分类时以 photos/、pdfs/ 下的子目录名作为分类。
+    """
+    with build_stage("process_photos.scan"):
+        photo_index = scan_directory(PHOTO_DIR, PHOTO_EXTENSIONS)
+        pdf_index = scan_directory(PDF_DIR, PDF_EXTENSIONS)
+        # 子目录中的项目输出到 thumbnails/、pdfs/ 下的同名子目录
+        for folder in {name.rpartition("/")[0] for name in itertools.chain(photo_index, pdf_index)} - {""}:
+            os.makedirs(os.path.join(THUMBNAIL_DIR, folder), exist_ok=True)
+            os.makedirs(os.path.join(PDF_DEST_DIR, folder), exist_ok=True)
+    previous_items = load_manifest()
+    settings = thumbnail_settings(resample, fingerprint)
+    metadata = load_metadata()
+    sources = iter_photo_items(photo_index, pdf_index, previous_items, settings, full_rebuild)
+    
+    if pdf_covers:
+        with build_stage("process_photos.covers"):
+            orphans = [(name, pdf_index[name]) for name in sorted(pdf_index) if name not in photo_index]
+            covers = pdf_cover_items(orphans, previous_items, settings, full_rebuild, jobs)
+        sources = itertools.chain(sources, covers)
+    
+    if duplicates == "collapse":
+        # 折叠相似照片需要先看到全部项目，才能确定哪些项目不必生成缩略图
+        with build_stage("process_photos.dedupe"):
+            sources = list(sources)
+            sources = resolve_duplicates(sources, perceptual_hashes(sources, jobs, max_pixels), duplicates)
+    
+    items = []
+    owners = {}
+    shared = []
+    
+    def thumbnail_tasks():
+        # 边扫描边提交：只为需要重建的项目生成缩略图，与已见过的项目内容相同的照片共享其缩略图
+        for item in sources:
+            items.append(item)
+            owner = owners.setdefault(item["photo_record"]["hash"], item)
+            if not item["stale"]:
+                continue
+            if owner is item:
+                yield item
+            else:
+                shared.append((item, owner))
+    
+    encoded = 0
+    with build_stage("process_photos.thumbnails"):
+        for task, result in run_thumbnail_jobs(thumbnail_tasks(), settings, jobs, max_pixels,
+                                               phash=duplicates == "report"):
+            encoded += 1
+            task["error"] = result["error"]
+            task["variants"] = result["variants"]
+            task["placeholder"] = result["placeholder"]
+            task["phash"] = result["phash"]
+            # 各步骤耗时为工作进程内的累计时间，并行时总和可能大于阶段的墙钟时间
+            for step, seconds in result["timings"].items():
+                record_stage(f"thumbnail.{step}", seconds)
+            record_stage("process_photos.thumbnails", bytes_read=result["bytes_read"],
+                         bytes_written=result["bytes_written"], calls=0)
+            record_item(task["name"],
+                        thumbnail_seconds=sum(result["timings"].values()),
+                        **{f"{step}_seconds": seconds for step, seconds in result["timings"].items()},
+                        bytes_read=result["bytes_read"],
+                        bytes_written=result["bytes_written"])
+    with build_stage("process_photos.share"):
+        for item, owner in shared:
+            item["error"] = owner.get("error")
+            item["placeholder"] = owner["placeholder"]
+            if item["error"] is None:
+                item["variants"] = share_thumbnails(owner["variants"], owner["thumbnail_base"],
+                                                    item["thumbnail_base"])
+    if shared:
+        print(f"内容相同的照片共享缩略图: {len(shared)} 个项目")
+    if duplicates == "report":
+        # 新照片的感知哈希已在生成缩略图时顺带算出，这里不再重复解码
+        with build_stage("process_photos.dedupe"):
+            resolve_duplicates(items, perceptual_hashes(items, jobs, max_pixels), duplicates)
+    
+    photo_data = []
+    current_items = {}
+    for item in items:
+        if item["stale"] and item["error"] is not None:
+            print(f"处理图片 {item['photo_path']} 时出错: {item['error']}")
+            continue
+        # 发布PDF到目标目录；未变化的项目同样检查，目标被删除、内容或发布方式改变时重新发布。
+        # 有清单条目时按内容哈希判断，没有时才按源文件与目标的大小和修改时间判断
+        previous = previous_items.get(item["name"])
+        start = time.perf_counter()
+        with build_stage("process_photos.publish"):
+            if not full_rebuild and previous and is_pdf_current(previous, item["pdf_record"], item["dest_pdf_path"], publish):
+                method = None
+            else:
+                method = publish_file(item["pdf_path"], item["dest_pdf_path"], publish,
+                                      force=full_rebuild or previous is not None)
+        if method is not None:
+            record_item(item["name"], publish_seconds=time.perf_counter() - start)
         
-        # 复制PDF到目标目录
-        dest_pdf_path = os.path.join(PDF_DEST_DIR, f"{photo_name}.pdf")
-        shutil.copy2(pdf_path, dest_pdf_path)
+        variants = item["variants"]
+        outputs = {
+            "thumbnails": [variant["path"] for variant in variants],
+            "pdf": os.path.relpath(item["dest_pdf_path"], GALLERY_DIR)
+        }
+        current_items[item["name"]] = {
+            "photo": item["photo_record"],
+            "pdf": item["pdf_record"],
+            "thumbnail_settings": settings,
+            "publish": publish,
+            "thumbnails": variants,
+            "placeholder": item["placeholder"],
+            "outputs": outputs
+        }
         
         # 收集数据用于生成HTML
+        fallback = fallback_variant(variants)
+        meta = metadata.get(item["name"], {})
+        folder, _, base_name = item["name"].rpartition("/")
         photo_data.append({
-            "name": photo_name,
-            "thumbnail": os.path.relpath(thumbnail_path, GALLERY_DIR),
-            "pdf": os.path.relpath(dest_pdf_path, GALLERY_DIR)
+            "name": item["name"],
+            "title": meta.get("title") or base_name,
+            "category": meta.get("category") or folder or None,
+            "thumbnail": fallback["path"],
+            "width": fallback["width"],
+            "height": fallback["height"],
+            "variants": variants,
+            "placeholder": item["placeholder"],
+            "pdf": outputs["pdf"],
+            "pdf_hash": item["pdf_record"]["hash"]
         })
     
+    with build_stage("process_photos.cleanup"):
+        remove_stale_outputs(previous_items, current_items)
+        if pdf_covers:
+            prune_cover_cache(entry["photo"]["path"] for entry in current_items.values())
+        save_manifest(current_items)
+    skipped = len(items) - encoded - len(shared)
+    if skipped:
+        print(f"增量构建: {skipped} 个项目未变化，已跳过")
+    
+    # 元数据中指定了 order 的项目在前，其余按名称排列
+    def sort_key(entry):
+        order = metadata.get(entry["name"], {}).get("order")
+        return (order is None, order or 0, entry["name"])
+    photo_data.sort(key=sort_key)
     return photo_data
 
-def generate_html(photo_data):
-    """生成与北京愉佚科技风格一致的HTML页面"""
-    html = '''<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta name="baidu-site-verification" content="codeva-GoGsXK3SLW">
-    <title>北京愉佚科技 - PDF文件画廊</title>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1, user-scalable=no">
-    <meta name="description" content="北京愉佚科技PDF文件展示，点击图片查看详细PDF内容">
-    <meta name="keywords" content="北京愉佚科技, PDF查看, 技术文档, 资料下载">
-    <!-- 引入Tailwind CSS -->
-    <script src="https://cdn.tailwindcss.com"></script>
-    <!-- 引入Font Awesome -->
-    <link href="https://cdn.jsdelivr.net/npm/font-awesome@4.7.0/css/font-awesome.min.css" rel="stylesheet">
-    <link href="image/logo.png" rel="icon" type="image/png">
-    <script>
-        // Tailwind配置
-        tailwind.config = {
-            theme: {
-                extend: {
-                    colors: {
-                        primary: '#165DFF',
-                        secondary: '#36BFFA',
-                        dark: '#1D2939',
-                        light: '#F9FAFB',
-                        accent: '#0284C7'
-                    },
-                    fontFamily: {
-                        sans: ['Inter', 'system-ui', 'sans-serif'],
-                    },
-                }
-            }
-        }
-    </script>
-    <style type="text/tailwindcss">
-        @layer utilities {
-            .content-auto {
-                content-visibility: auto;
-            }
-            .text-shadow {
-                text-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            .hover-lift {
-                transition: transform 0.3s ease, box-shadow 0.3s ease;
-            }
-            .hover-lift:hover {
-                transform: translateY(-5px);
-                box-shadow: 0 10px 25px -5px rgba(0, 0, 0, 0.1), 0 10px 10px -5px rgba(0, 0, 0, 0.04);
-            }
-            .gradient-overlay {
-                background: linear-gradient(180deg, rgba(0,0,0,0.1) 0%, rgba(0,0,0,0.7) 100%);
-            }
-        }
-    </style>
-</head>
-<body class="bg-light text-dark antialiased">
-    <!-- 顶部通知栏 -->
-    <div class="bg-primary text-white text-center py-2 text-sm z-50 relative">
-        <p>专业技术服务 · 创新解决方案 · 高效实施支持</p>
-    </div>
-
-    <!-- Wrapper -->
-    <div id="wrapper" class="min-h-screen flex flex-col">
-
-        <!-- Header -->
-        <header id="header" class="sticky top-0 z-40 bg-white/95 backdrop-blur-sm shadow-sm transition-all duration-300">
-            <div class="container mx-auto px-4 py-3 flex items-center justify-between">
-                <a href="index.html" class="flex items-center space-x-2">
-                    <img src="image/logo.png" alt="北京愉佚科技logo" class="h-10 w-auto rounded">
-                    <div>
-                        <strong class="text-xl font-bold text-primary">北京愉佚科技发展有限公司</strong>
-                        <span class="block text-sm text-gray-600">技术服务与创新</span>
-                    </div>
-                </a>
-                
-                <!-- 桌面导航 -->
-                <nav class="hidden md:flex items-center space-x-8">
-                    <a href="index.html" class="font-medium text-gray-700 hover:text-primary transition-colors">首页</a>
-                    <a href="about.html" class="font-medium text-gray-700 hover:text-primary transition-colors">公司简介</a>
-                    <a href="services.html" class="font-medium text-gray-700 hover:text-primary transition-colors">服务项目</a>
-                    <a href="https://space.bilibili.com/3546822953928942?spm_id_from=333.33.0.0" target="_blank" class="font-medium text-gray-700 hover:text-primary transition-colors">新闻动态</a>
-                    <a href="careers.html" class="font-medium text-gray-700 hover:text-primary transition-colors">招聘信息</a>
-                    <a href="contact.html" class="font-medium text-gray-700 hover:text-primary transition-colors">联系方式</a>
-                    <a href="pdf-gallery.html" class="font-medium text-primary hover:text-accent transition-colors">PDF画廊</a>
-                    <a href="index_en.html" class="ml-4 px-3 py-1 text-sm border border-primary text-primary rounded hover:bg-primary hover:text-white transition-colors">EN</a>
-                </nav>
-                
-                <!-- 移动端菜单按钮 -->
-                <div class="flex items-center md:hidden">
-                    <a href="index_en.html" class="mr-4 px-3 py-1 text-sm border border-primary text-primary rounded hover:bg-primary hover:text-white transition-colors">EN</a>
-                    <button id="menu-toggle" class="text-gray-700 focus:outline-none">
-                        <i class="fa fa-bars text-xl"></i>
-                    </button>
-                </div>
-            </div>
-            
-            <!-- 移动端菜单 -->
-            <div id="mobile-menu" class="md:hidden hidden bg-white border-t z-50 absolute w-full left-0">
-                <div class="container mx-auto px-4 py-2 flex flex-col space-y-3">
-                    <a href="index.html" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">首页</a>
-                    <a href="about.html" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">公司简介</a>
-                    <a href="services.html" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">服务项目</a>
-                    <a href="https://space.bilibili.com/3546822953928942?spm_id_from=333.33.0.0" target="_blank" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">新闻动态</a>
-                    <a href="careers.html" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">招聘信息</a>
-                    <a href="contact.html" class="py-2 font-medium text-gray-700 hover:text-primary transition-colors">联系方式</a>
-                    <a href="pdf-gallery.html" class="py-2 font-medium text-primary hover:text-accent transition-colors">PDF画廊</a>
-                </div>
-            </div>
-        </header>
-
-        <!-- Banner -->
-        <section id="banner" class="relative h-[60vh] min-h-[400px] flex items-center justify-center overflow-hidden z-10">
-            <div class="absolute inset-0 z-0">
-                <img src="https://picsum.photos/id/180/1920/1080" alt="PDF文档展示背景" class="w-full h-full object-cover">
-                <div class="absolute inset-0 bg-dark/50"></div>
-            </div>
-            <div class="container mx-auto px-4 z-20 text-center relative">
-                <h1 class="text-[clamp(2rem,5vw,3.5rem)] font-bold text-white mb-6 leading-tight text-shadow animate-fade-in">
-                    PDF文件画廊
-                </h1>
-                <p class="text-[clamp(1rem,2vw,1.25rem)] text-gray-100 mb-8 max-w-3xl mx-auto">
-                    展示北京愉佚科技各类技术文档与资料，点击图片即可在线查看完整PDF内容
-                </p>
-                <div class="flex flex-col sm:flex-row justify-center gap-4">
-                    <a href="#pdf-gallery" class="px-8 py-3 bg-primary text-white rounded-lg font-medium hover:bg-primary/90 transition-all shadow-lg hover:shadow-xl transform hover:-translate-y-1 relative z-30">
-                        查看PDF列表
-                    </a>
-                    <a href="contact.html" class="px-8 py-3 bg-white/10 backdrop-blur-sm text-white border border-white/30 rounded-lg font-medium hover:bg-white/20 transition-all relative z-30">
-                        咨询技术支持
-                    </a>
-                </div>
-            </div>
-            <div class="absolute bottom-8 left-0 right-0 flex justify-center animate-bounce z-20">
-                <a href="#pdf-gallery" class="text-white/80 hover:text-white">
-                    <i class="fa fa-angle-down text-3xl"></i>
-                </a>
-            </div>
-        </section>
-
-        <!-- Main -->
-        <div id="main" class="flex-grow relative z-20 bg-light">
-
-            <!-- PDF画廊展示区 -->
-            <section id="pdf-gallery" class="py-16 bg-gray-50 relative z-20">
-                <div class="container mx-auto px-4">
-                    <div class="text-center mb-16 relative z-30">
-                        <h2 class="text-[clamp(1.5rem,3vw,2.5rem)] font-bold text-dark mb-4">文档列表</h2>
-                        <p class="text-gray-600 max-w-2xl mx-auto">点击下方图片查看对应PDF文档，支持在线浏览与下载</p>
-                    </div>
-                    
-                    <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6">'''
-    
-    # 循环插入PDF与照片卡片
+def url_path(path):
+    """把相对路径转换为可放入 src/srcset 的 URL（对空格、逗号和中文等字符编码）"""
+    return quote(path.replace(os.sep, "/"))
+
+def srcset(variants, fmt):
+    """生成指定格式的 srcset 属性值"""
+    return ", ".join(f"{url_path(v['path'])} {v['width']}w" for v in variants if v["format"] == fmt)
+
+def load_template(name):
+    """读取并编译 TEMPLATE_DIR 下的模板
+
+    编译结果按文件修改时间缓存，同一进程内多次生成页面时不会重复读取，
+    模板被修改后自动重新加载。
+    """
+    path = os.path.join(TEMPLATE_DIR, name)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        template = Template(f.read())
+    _template_cache[path] = (mtime, template)
+    return template
+
+def source_formats(variants):
+    """按优先级列出变体中的现代格式（AVIF/WebP），不含 JPEG 兜底格式"""
+    formats = []
+    for variant in variants:
+        if variant["format"] != THUMBNAIL_FALLBACK_FORMAT and variant["format"] not in formats:
+            formats.append(variant["format"])
+    return formats
+
+def picture_sources(item):
+    """为卡片生成现代格式（AVIF/WebP）的 <source> 标签，JPEG 由 <img> 兜底"""
+    return "".join(f'''
+                                    <source type="{IMAGE_FORMATS[fmt]["mime"]}" srcset="{escape(srcset(item["variants"], fmt))}" sizes="{THUMBNAIL_SIZES}">'''
+                   for fmt in source_formats(item["variants"]))
+
+def placeholder_style(placeholder):
+    """占位图的内联样式：主色背景上铺满放大（浏览器插值后自然模糊）的预览图，缩略图加载后将其覆盖"""
+    if not placeholder:
+        return ""
+    return f"background:{placeholder['color']} url({placeholder['preview']}) center/cover no-repeat"
+
+def render_card(item):
+    """渲染单张卡片；标题做 HTML 转义，PDF 路径先转为 JS 字符串再做属性转义
+
+    渲染结果按模板和卡片内容缓存，模板或项目变化时自动重新渲染。
+    """
+    template = load_template("card.html")
+    placeholder = placeholder_style(item.get("placeholder"))
+    # 以模板源码而非对象 id 作为键：模板重新加载后旧对象的 id 可能被新对象复用
+    key = (template.template, item["title"], item["pdf"], item["thumbnail"], item["width"], item["height"],
+           tuple((v["format"], v["width"], v["path"]) for v in item["variants"]), placeholder)
+    html = _card_cache.get(key)
+    if html is None:
+        html = template.substitute(
+            pdf_js=escape(json.dumps(item["pdf"], ensure_ascii=False)),
+            name_js=escape(json.dumps(item["title"], ensure_ascii=False)),
+            placeholder=escape(placeholder),
+            sources=picture_sources(item),
+            src=escape(url_path(item["thumbnail"])),
+            srcset=escape(srcset(item["variants"], THUMBNAIL_FALLBACK_FORMAT)),
+            sizes=THUMBNAIL_SIZES,
+            width=item["width"],
+            height=item["height"],
+            name=escape(item["title"])
+        )
+        if len(_card_cache) >= CARD_CACHE_LIMIT:
+            _card_cache.clear()
+        _card_cache[key] = html
+    return html
+
+def render_category_card(category):
+    """渲染分类索引中的卡片：链接到分类页，以分类中第一个项目的缩略图作为封面"""
+    cover = category["items"][0]
+    return load_template("category-card.html").substitute(
+        href=escape(url_path(page_filename(1, category["shard"]))),
+        placeholder=escape(placeholder_style(cover.get("placeholder"))),
+        sources=picture_sources(cover),
+        src=escape(url_path(cover["thumbnail"])),
+        srcset=escape(srcset(cover["variants"], THUMBNAIL_FALLBACK_FORMAT)),
+        sizes=THUMBNAIL_SIZES,
+        width=cover["width"],
+        height=cover["height"],
+        name=escape(category["category"]),
+        count=len(category["items"])
+    )
+
+def category_slug(category):
+    """把分类名转换为文件名片段：保留字母、数字和中文，其余字符替换为连字符"""
+    slug = re.sub(r"[^\w]+", "-", unicodedata.normalize("NFKC", category).lower()).strip("-_")
+    return slug or hashlib.sha256(category.encode("utf-8")).hexdigest()[:FINGERPRINT_LENGTH]
+
+def group_by_category(photo_data):
+    """按分类把项目分组，分类按首次出现的顺序排列，组内保持项目原有顺序
+
+    没有分类的项目归入 UNCATEGORIZED；所有项目都没有分类时返回空列表。
+    """
+    if not any(item.get("category") for item in photo_data):
+        return []
+    groups = {}
     for item in photo_data:
-        html += f'''
-                        <article class="tile bg-white rounded-xl overflow-hidden shadow-md hover-lift relative z-30 cursor-pointer" onclick="openPdf('{item["pdf"]}')">
-                            <span class="image h-48 overflow-hidden">
-                                <img src="{item["thumbnail"]}" alt="{item["name"]}封面" class="w-full h-full object-cover transition-transform duration-500 hover:scale-110">
-                            </span>
-                            <header class="major p-6">
-                                <h3 class="link text-xl font-bold text-dark hover:text-primary transition-colors">{item["name"]}</h3>
-                                <p class="text-gray-600 flex items-center mt-2">
-                                    <i class="fa fa-file-pdf-o text-red-500 mr-2"></i>
-                                    点击查看PDF
-                                </p>
-                            </header>
-                        </article>'''
+        groups.setdefault(item.get("category") or UNCATEGORIZED, []).append(item)
+    categories = []
+    used = set()
+    for category, items in groups.items():
+        slug = category_slug(category)
+        if slug in used:
+            # 不同分类名转换后相同（如“A B”与“A-B”）时追加分类名的哈希
+            slug += "-" + hashlib.sha256(category.encode("utf-8")).hexdigest()[:FINGERPRINT_LENGTH]
+        used.add(slug)
+        categories.append({"category": category, "shard": CATEGORY_PAGE_PREFIX + slug, "items": items})
+    return categories
+
+def page_filename(page, shard=None):
+    """第 1 页为 index.html，其余为 page-N.html；分类页为 <shard>.html、<shard>.page-N.html
+
+    分类名转换后只含字母数字、下划线和连字符（见 category_slug），用点分隔页码，
+    不会与另一个分类的第 1 页重名（如分类“a”的第 2 页与分类“a-page-2”）。
+    """
+    if shard is None:
+        return "index.html" if page == 1 else f"page-{page}.html"
+    return f"{shard}.html" if page == 1 else f"{shard}.page-{page}.html"
+
+def paginate(photo_data, page_size):
+    """按每页数量切分项目，page_size 不大于 0 时全部放在一页"""
+    if page_size <= 0 or not photo_data:
+        return [photo_data]
+    return [photo_data[i:i + page_size] for i in range(0, len(photo_data), page_size)]
+
+def render_pagination(page, total_pages, shard=None):
+    """生成分页导航：上一页/下一页、首尾页以及当前页附近的页码"""
+    if total_pages <= 1:
+        return ""
+    indent = " " * 24
+    links = []
+    if page > 1:
+        links.append(f'{indent}<a href="{url_path(page_filename(page - 1, shard))}" rel="prev" class="{PAGINATION_LINK_CLASS}">上一页</a>')
+    shown = {1, total_pages} | set(range(page - PAGINATION_WINDOW, page + PAGINATION_WINDOW + 1))
+    previous = 0
+    for number in sorted(n for n in shown if 1 <= n <= total_pages):
+        if number - previous > 1:
+            links.append(f'{indent}<span class="{PAGINATION_GAP_CLASS}">…</span>')
+        if number == page:
+            links.append(f'{indent}<span aria-current="page" class="{PAGINATION_CURRENT_CLASS}">{number}</span>')
+        else:
+            links.append(f'{indent}<a href="{url_path(page_filename(number, shard))}" class="{PAGINATION_LINK_CLASS}">{number}</a>')
+        previous = number
+    if page < total_pages:
+        links.append(f'{indent}<a href="{url_path(page_filename(page + 1, shard))}" rel="next" class="{PAGINATION_LINK_CLASS}">下一页</a>')
+    return load_template("pagination.html").substitute(links="\n".join(links))
+
+def write_page_assets(fingerprint=False):
+    """按模板中实际用到的类名和图标生成页面资源
+
+    写出只含这些类的压缩样式表（fingerprint 为 True 时文件名带内容哈希）并删除旧的样式表，
+    返回页头需要的字段：内联的关键CSS、样式表地址和图标 symbol 雪碧图。
+    """
+    markup = [load_template(name).template for name in PAGE_TEMPLATES] + [INFINITE_SENTINEL, CATEGORY_BACK_LINK]
+    classes = set().union(*(collect_classes(text) for text in markup))
+    classes.update(" ".join((PAGINATION_LINK_CLASS, PAGINATION_CURRENT_CLASS, PAGINATION_GAP_CLASS)).split())
+    stylesheet = build_stylesheet(classes).encode("utf-8")
+    name = fingerprinted(STYLESHEET_NAME, hashlib.sha256(stylesheet).hexdigest(), fingerprint)
+    output_path = os.path.join(GALLERY_DIR, name)
+    with open(output_path + ".tmp", "wb") as f:
+        f.write(stylesheet)
+    record_bytes(written=len(stylesheet))
+    os.replace(output_path + ".tmp", output_path)
+    root, ext = os.path.splitext(STYLESHEET_NAME)
+    for path in glob.glob(os.path.join(GALLERY_DIR, f"{root}*{ext}")):
+        if os.path.basename(path) != name:
+            os.remove(path)
     
-    # 关闭网格布局，继续补充页面剩余部分
-    html += '''
-                    </div>
-                </div>
-            </section>
-
-            <!-- 联系区域 -->
-            <section id="two" class="py-20 bg-gradient-to-r from-primary to-accent text-white relative z-20">
-                <div class="container mx-auto px-4 text-center relative z-30">
-                    <header class="major mb-10">
-                        <h2 class="text-[clamp(1.5rem,3vw,2.5rem)] font-bold">联系我们</h2>
-                    </header>
-                    <p class="text-white/90 text-lg max-w-2xl mx-auto mb-8">
-                        沟通零距离，服务无止境。北京愉佚科技，您身边的技术专家，随时恭候您的垂询。
-                    </p>
-                    <ul class="actions justify-center">
-                        <li><a href="contact.html" class="px-8 py-3 bg-white text-primary rounded-lg font-medium hover:bg-gray-100 transition-all shadow-lg relative z-40">
-                            查看联系方式
-                        </a></li>
-                    </ul>
-                </div>
-            </section>
-
-        </div>
-
-        <!-- Footer -->
-        <footer id="footer" class="bg-dark text-white pt-16 pb-8 relative z-20">
-            <div class="container mx-auto px-4">
-                <div class="grid grid-cols-1 md:grid-cols-4 gap-8 mb-12">
-                    <div>
-                        <h3 class="text-xl font-bold mb-4">北京愉佚科技</h3>
-                        <p class="text-gray-400 mb-4">
-                            致力于科技推广和应用服务业，提供全面的技术支持和服务。
-                        </p>
-                        <div class="flex space-x-4">
-                            <a href="#" class="text-gray-400 hover:text-white transition-colors">
-                                <i class="fa fa-weixin text-xl"></i>
-                            </a>
-                            <a href="#" class="text-gray-400 hover:text-white transition-colors">
-                                <i class="fa fa-weibo text-xl"></i>
-                            </a>
-                            <a href="#" class="text-gray-400 hover:text-white transition-colors">
-                                <i class="fa fa-linkedin text-xl"></i>
-                            </a>
-                        </div>
-                    </div>
-                    
-                    <div>
-                        <h3 class="text-lg font-bold mb-4">快速链接</h3>
-                        <ul class="space-y-2">
-                            <li><a href="index.html" class="text-gray-400 hover:text-white transition-colors">首页</a></li>
-                            <li><a href="about.html" class="text-gray-400 hover:text-white transition-colors">公司简介</a></li>
-                            <li><a href="services.html" class="text-gray-400 hover:text-white transition-colors">服务项目</a></li>
-                            <li><a href="careers.html" class="text-gray-400 hover:text-white transition-colors">招聘信息</a></li>
-                            <li><a href="contact.html" class="text-gray-400 hover:text-white transition-colors">联系方式</a></li>
-                            <li><a href="pdf-gallery.html" class="text-gray-400 hover:text-white transition-colors">PDF画廊</a></li>
-                        </ul>
-                    </div>
-                    
-                    <div>
-                        <h3 class="text-lg font-bold mb-4">联系我们</h3>
-                        <ul class="space-y-2">
-                            <li class="flex items-start">
-                                <i class="fa fa-map-marker mt-1 mr-3 text-gray-400"></i>
-                                <span class="text-gray-400">北京市朝阳区科技园区88号</span>
-                            </li>
-                            <li class="flex items-center">
-                                <i class="fa fa-phone mr-3 text-gray-400"></i>
-                                <span class="text-gray-400">010-82721226</span>
-                            </li>
-                            <li class="flex items-center">
-                                <i class="fa fa-envelope mr-3 text-gray-400"></i>
-                                <span class="text-gray-400">contact@pleasantteches.com</span>
-                            </li>
-                        </ul>
-                    </div>
-                    
-                    <div>
-                        <h3 class="text-lg font-bold mb-4">订阅资讯</h3>
-                        <p class="text-gray-400 mb-4">订阅我们的新闻资讯，了解最新动态</p>
-                        <form class="flex relative z-30">
-                            <input type="email" placeholder="您的邮箱地址" class="px-4 py-2 rounded-l-lg w-full focus:outline-none text-dark shadow-sm">
-                            <button type="submit" class="bg-primary hover:bg-primary/90 px-4 py-2 rounded-r-lg transition-colors shadow-sm">
-                                <i class="fa fa-paper-plane"></i>
-                            </button>
-                        </form>
-                    </div>
-                </div>
-                
-                <div class="border-t border-gray-800 pt-8 text-center text-gray-500 text-sm">
-                    <ul class="copyright">
-                        <li>© 北京愉佚科技发展有限公司 2025</li>
-                        <li class="mt-1">© PleasantTech Ventures Co., Ltd. 2025</li>
-                    </ul>
-                </div>
-            </div>
-        </footer>
-
-    </div>
-
-    <!-- PDF查看器模态框 -->
-    <div id="pdfModal" class="fixed inset-0 bg-black bg-opacity-75 flex items-center justify-center z-50 hidden">
-        <div class="bg-white rounded-lg w-full max-w-4xl max-h-[90vh] flex flex-col">
-            <div class="p-4 border-b flex justify-between items-center">
-                <h2 id="pdfTitle" class="text-xl font-bold">PDF查看器</h2>
-                <button onclick="closePdf()" class="text-gray-500 hover:text-gray-700">
-                    <i class="fa fa-times text-xl"></i>
-                </button>
-            </div>
-            <div class="flex-1 overflow-auto p-4">
-                <embed id="pdfEmbed" src="" type="application/pdf" width="100%" height="600px">
-            </div>
-        </div>
-    </div>
-
-    <!-- Scripts -->
-    <script>
-        // 移动端菜单切换
-        document.getElementById('menu-toggle').addEventListener('click', function() {
-            const mobileMenu = document.getElementById('mobile-menu');
-            mobileMenu.classList.toggle('hidden');
-        });
-
-        // 滚动时改变导航栏样式
-        window.addEventListener('scroll', function() {
-            const header = document.getElementById('header');
-            if (window.scrollY > 50) {
-                header.classList.add('py-2', 'shadow');
-                header.classList.remove('py-3');
-            } else {
-                header.classList.add('py-3');
-                header.classList.remove('py-2', 'shadow');
-            }
-        });
-
-        // 平滑滚动
-        document.querySelectorAll('a[href^="#"]').forEach(anchor => {
-            anchor.addEventListener('click', function (e) {
-                e.preventDefault();
-                const targetId = this.getAttribute('href');
-                if (targetId === '#') return;
-                
-                const targetElement = document.querySelector(targetId);
-                if (targetElement) {
-                    window.scrollTo({
-                        top: targetElement.offsetTop - 80,
-                        behavior: 'smooth'
-                    });
-                    
-                    // 关闭移动菜单（如果打开）
-                    document.getElementById('mobile-menu').classList.add('hidden');
-                }
-            });
-        });
-
-        // 添加淡入动画
-        document.addEventListener('DOMContentLoaded', function() {
-            const fadeElements = document.querySelectorAll('.animate-fade-in');
-            fadeElements.forEach(el => {
-                el.style.opacity = '0';
-                el.style.transform = 'translateY(20px)';
-                el.style.transition = 'opacity 0.6s ease, transform 0.6s ease';
-                
-                setTimeout(() => {
-                    el.style.opacity = '1';
-                    el.style.transform = 'translateY(0)';
-                }, 300);
-            });
-        });
-
-        // PDF查看器功能
-        function openPdf(pdfPath) {
-            const modal = document.getElementById('pdfModal');
-            const embed = document.getElementById('pdfEmbed');
-            const title = document.getElementById('pdfTitle');
-            
-            // 提取文件名作为标题
-            const fileName = pdfPath.split('/').pop().replace('.pdf', '');
-            
-            embed.src = pdfPath;
-            title.textContent = fileName;
-            modal.classList.remove('hidden');
-            document.body.style.overflow = 'hidden'; // 防止背景滚动
-        }
-        
-        // 关闭PDF查看器
-        function closePdf() {
-            const modal = document.getElementById('pdfModal');
-            modal.classList.add('hidden');
-            document.body.style.overflow = ''; // 恢复滚动
-        }
-        
-        // 点击模态框外部关闭
-        document.getElementById('pdfModal').addEventListener('click', function(e) {
-            if (e.target === this) {
-                closePdf();
-            }
-        });
+    header = load_template("header.html").template
+    with open(os.path.join(TEMPLATE_DIR, ICON_SET), "r", encoding="utf-8") as f:
+        icons = icon_sprite(set(ICON_REF_RE.findall("".join(markup))), f.read())
+    return {
+        "critical_css": build_stylesheet(collect_classes(header.split(CRITICAL_CSS_END)[0])),
+        "stylesheet": url_path(name),
+        "icons": icons
+    }
+
+def write_page(filename, cards, assets, title_suffix="", pagination="", scripts="",
+               heading=PAGE_HEADING, intro=PAGE_INTRO, breadcrumb=""):
+    """把页头、已渲染的卡片和页尾依次流式写入带缓冲的临时文件，完成后再原子替换目标页面"""
+    output_path = os.path.join(GALLERY_DIR, filename)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", buffering=HTML_WRITE_BUFFER) as f:
+        f.write(load_template("header.html").substitute(
+            assets, title_suffix=escape(title_suffix), heading=escape(heading), intro=escape(intro),
+            breadcrumb=breadcrumb))
+        # 循环插入PDF与照片卡片（或分类卡片）
+        for card in cards:
+            f.write(card)
+        # 关闭网格布局，继续补充页面剩余部分
+        f.write(load_template("footer.html").substitute(pagination=pagination, scripts=scripts))
+    record_bytes(written=os.path.getsize(tmp_path))
+    os.replace(tmp_path, output_path)
+
+def write_items_manifest(photo_data, filename=ITEMS_MANIFEST):
+    """写出无限滚动使用的紧凑卡片数据清单"""
+    manifest = {
+        "sizes": THUMBNAIL_SIZES,
+        "items": [{
+            "name": item["title"],
+            "pdf": item["pdf"],
+            "src": url_path(item["thumbnail"]),
+            "srcset": srcset(item["variants"], THUMBNAIL_FALLBACK_FORMAT),
+            "sources": [[IMAGE_FORMATS[fmt]["mime"], srcset(item["variants"], fmt)]
+                        for fmt in source_formats(item["variants"])],
+            "width": item["width"],
+            "height": item["height"],
+            "placeholder": placeholder_style(item.get("placeholder"))
+        } for item in photo_data]
+    }
+    output_path = os.path.join(GALLERY_DIR, filename)
+    with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    record_bytes(written=os.path.getsize(output_path + ".tmp"))
+    os.replace(output_path + ".tmp", output_path)
+
+def write_items_pages(photo_data, assets, shard=None, page_size=0, infinite_scroll=False, title="",
+                      breadcrumb=""):
+    """写出一组项目的页面（shard 为 None 时从 index.html 开始，否则为分类页），返回写出的文件名
+
+    默认所有卡片在一页；page_size 大于 0 时按页拆分并附带分页导航。infinite_scroll 为 True 时
+    只渲染首批卡片，其余卡片由页面脚本读取紧凑的 JSON 清单按需渲染。
+    """
+    heading = title or PAGE_HEADING
+    if infinite_scroll:
+        batch_size = page_size if page_size > 0 else INFINITE_BATCH_SIZE
+        manifest = f"{shard}.{ITEMS_MANIFEST}" if shard else ITEMS_MANIFEST
+        write_items_manifest(photo_data, manifest)
+        placeholder = {"name": "", "title": "", "pdf": "", "thumbnail": "", "variants": [], "width": "", "height": ""}
+        scripts = load_template("infinite-scroll.html").substitute(
+            card=render_card(placeholder).rstrip("\n"),
+            batch_size=batch_size,
+            manifest_url=url_path(manifest)
+        )
+        filename = page_filename(1, shard)
+        write_page(filename, map(render_card, photo_data[:batch_size]), assets, f" - {title}" if title else "",
+                   INFINITE_SENTINEL, scripts, heading=heading, breadcrumb=breadcrumb)
+        return [filename, manifest]
+    
+    pages = paginate(photo_data, page_size)
+    written = []
+    for page, items in enumerate(pages, start=1):
+        filename = page_filename(page, shard)
+        title_suffix = (f" - {title}" if title else "") + (f" - 第{page}页" if page > 1 else "")
+        write_page(filename, map(render_card, items), assets, title_suffix,
+                   render_pagination(page, len(pages), shard), heading=heading, breadcrumb=breadcrumb)
+        written.append(filename)
+    return written
+
+def card_fields(item):
+    """卡片内容依赖的项目字段，用于计算分片摘要"""
+    return [item["title"], item["pdf"], item["thumbnail"], item["width"], item["height"],
+            item["variants"], item.get("placeholder")]
+
+def load_page_manifest():
+    """读取上次生成页面时的分片摘要，不存在或格式不符时返回空字典"""
+    try:
+        with open(PAGE_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("shards", {})
+
+def save_page_manifest(shards):
+    """原子地写入页面清单"""
+    tmp_path = PAGE_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "shards": shards}, f,
+                  ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, PAGE_MANIFEST_PATH)
+
+def remove_stale_pages(written):
+    """删除上次构建遗留、本次未生成的分页、分类页面和数据清单"""
+    stale = set()
+    for pattern in ("page-*.html", f"{CATEGORY_PAGE_PREFIX}*.html", f"*.{ITEMS_MANIFEST}"):
+        stale.update(glob.glob(os.path.join(GALLERY_DIR, pattern)))
+    stale.add(os.path.join(GALLERY_DIR, ITEMS_MANIFEST))
+    for path in stale - {os.path.join(GALLERY_DIR, name) for name in written}:
+        if os.path.exists(path):
+            os.remove(path)
+
+def generate_html(photo_data, page_size=0, infinite_scroll=False, fingerprint=False, full_rebuild=False):
+    """生成与北京愉佚科技风格一致的HTML页面，返回所有页面的文件名
+
+    项目没有分类时全部卡片从 index.html 开始写出（分页与无限滚动见 write_items_pages）；
+    带分类时 index.html 是列出各分类及其文档数的索引，每个分类作为独立分片写出自己的页面。
+    每个分片的内容摘要（模板、页面资源、选项与卡片字段）记录在页面清单中，摘要未变化且
+    文件仍在的分片直接跳过（full_rebuild 为 True 时全部重写），因此只改动一个分类时只重写
+    该分类的页面。页面使用的样式表同时生成，fingerprint 为 True 时其文件名带内容哈希。
+    """
+    assets = write_page_assets(fingerprint)
+    templates = [load_template(name).template for name in PAGE_TEMPLATES]
+    previous = {} if full_rebuild else load_page_manifest()
+    shards = {}
+    
+    def render_shard(key, content, write):
+        digest = hashlib.sha256(json.dumps(
+            [templates, assets, page_size, infinite_scroll, content], ensure_ascii=False, sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        entry = previous.get(key)
+        if (entry and entry["digest"] == digest
+                and all(os.path.exists(os.path.join(GALLERY_DIR, name)) for name in entry["files"])):
+            files = entry["files"]
+        else:
+            files = write()
+        shards[key] = {"digest": digest, "files": files}
+    
+    categories = group_by_category(photo_data)
+    if not categories:
+        render_shard("index", [card_fields(item) for item in photo_data],
+                     lambda: write_items_pages(photo_data, assets, page_size=page_size,
+                                               infinite_scroll=infinite_scroll))
+    else:
+        def write_index():
+            write_page("index.html", map(render_category_card, categories), assets,
+                       heading=CATEGORY_INDEX_HEADING, intro=CATEGORY_INDEX_INTRO)
+            return ["index.html"]
         
-        // 按ESC键关闭
-        document.addEventListener('keydown', function(e) {
-            if (e.key === 'Escape' && !document.getElementById('pdfModal').classList.contains('hidden')) {
-                closePdf();
-            }
-        });
-    </script>
-</body>
-</html>'''
+        render_shard("index", [[c["category"], c["shard"], len(c["items"]), card_fields(c["items"][0])]
+                               for c in categories], write_index)
+        for category in categories:
+            render_shard(category["shard"], [category["category"], [card_fields(item) for item in category["items"]]],
+                         lambda category=category: write_items_pages(
+                             category["items"], assets, category["shard"], page_size, infinite_scroll,
+                             category["category"], CATEGORY_BACK_LINK))
     
-    # 保存HTML文件
-    with open(os.path.join(GALLERY_DIR, "index.html"), "w", encoding="utf-8") as f:
-        f.write(html)
+    rewritten = sum(1 for key, shard in shards.items() if shard["digest"] != previous.get(key, {}).get("digest"))
+    if len(shards) > 1:
+        print(f"页面分片: 共 {len(shards)} 个，重新生成 {rewritten} 个")
+    save_page_manifest(shards)
+    written = [name for shard in shards.values() for name in shard["files"]]
+    remove_stale_pages(written)
+    return [name for name in written if name.endswith(".html")]
 
-def main():
-    print("开始生成PDF和照片画廊...")
-    create_directories()
-    photo_data = process_photos()
+def write_sitemap(pages, photo_data, site_url=None):
+    """写出 sitemap.xml，列出所有页面和PDF的绝对地址，lastmod 取输出文件的修改时间
+
+    未指定 site_url 时不生成（站点地图要求绝对地址）并删除旧的站点地图。地址超过
+    SITEMAP_URL_LIMIT 个时拆分为 sitemap-N.xml，sitemap.xml 作为引用它们的站点地图索引。
+    """
+    root, ext = os.path.splitext(SITEMAP)
+    stale = set(glob.glob(os.path.join(GALLERY_DIR, f"{root}*{ext}")))
+    written = set()
+    
+    def write_xml(name, tag, entries):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 f'<{tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        child = "sitemap" if tag == "sitemapindex" else "url"
+        for path in entries:
+            mtime = os.path.getmtime(os.path.join(GALLERY_DIR, path))
+            lastmod = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime))
+            lines.append(f"  <{child}><loc>{escape(base + url_path(path))}</loc><lastmod>{lastmod}</lastmod></{child}>")
+        lines.append(f"</{tag}>")
+        output_path = os.path.join(GALLERY_DIR, name)
+        with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        record_bytes(written=os.path.getsize(output_path + ".tmp"))
+        os.replace(output_path + ".tmp", output_path)
+        written.add(output_path)
+    
+    if site_url:
+        base = site_url.rstrip("/") + "/"
+        paths = list(pages) + [item["pdf"] for item in photo_data]
+        if len(paths) <= SITEMAP_URL_LIMIT:
+            write_xml(SITEMAP, "urlset", paths)
+        else:
+            parts = []
+            for start in range(0, len(paths), SITEMAP_URL_LIMIT):
+                parts.append(f"{root}-{len(parts) + 1}{ext}")
+                write_xml(parts[-1], "urlset", paths[start:start + SITEMAP_URL_LIMIT])
+            write_xml(SITEMAP, "sitemapindex", parts)
+    for path in stale - written:
+        os.remove(path)
+
+def tokenize(text, prefix_limit=SEARCH_PREFIX_LIMIT):
+    """把文本切分为索引词元
+
+    CJK 连续片段取单字和相邻二元组（如“资产管理”得到 资、产、资产、产管……），
+    字母数字片段取整词及其不超过 prefix_limit 个字符的前缀，以便页面按输入前缀匹配。
+    """
+    tokens = set()
+    for run in TOKEN_RUN_RE.findall(unicodedata.normalize("NFKC", text).lower()):
+        if run[0].isascii():
+            tokens.add(run)
+            tokens.update(run[:i] for i in range(1, min(len(run), prefix_limit) + 1))
+        else:
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def extract_pdf_text(pdf_path, pages=SEARCH_PDF_PAGES):
+    """提取PDF前几页的文本，需要可选依赖 pypdf"""
+    reader = PdfReader(pdf_path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages[:pages])
+
+def load_text_cache():
+    """读取按PDF内容哈希缓存的正文词元，前缀长度上限不同或格式不符时返回空缓存"""
+    try:
+        with open(SEARCH_TEXT_CACHE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("prefix_limit") != SEARCH_PREFIX_LIMIT:
+        return {}
+    return cache.get("tokens", {})
+
+def pdf_text_tokens(photo_data):
+    """返回每个项目PDF正文的词元列表，未变化的PDF直接使用缓存"""
+    if PdfReader is None:
+        print("警告: 未安装 pypdf，搜索索引只包含文档标题")
+        return [[] for _ in photo_data]
+    cache = load_text_cache()
+    fresh = {}
+    result = []
+    for item in photo_data:
+        digest = item["pdf_hash"]
+        if digest not in cache:
+            try:
+                cache[digest] = sorted(tokenize(extract_pdf_text(os.path.join(GALLERY_DIR, item["pdf"]))))
+            except Exception as e:
+                print(f"提取PDF {item['pdf']} 文本时出错: {e}")
+                cache[digest] = []
+        fresh[digest] = cache[digest]
+        result.append(cache[digest])
+    with open(SEARCH_TEXT_CACHE, "w", encoding="utf-8") as f:
+        json.dump({"prefix_limit": SEARCH_PREFIX_LIMIT, "tokens": fresh}, f,
+                  ensure_ascii=False, separators=(",", ":"))
+    return result
+
+def build_search_index(photo_data, include_pdf_text=False):
+    """在 index.html 旁写出搜索索引：docs 为 [标题, PDF路径]，tokens 为词元到文档序号的倒排表
+
+    prefix_limit 为字母数字词元前缀的最大长度，页面脚本据此查找更长的查询词。
+    """
+    text_tokens = pdf_text_tokens(photo_data) if include_pdf_text else [[] for _ in photo_data]
+    postings = {}
+    for doc_id, (item, extra) in enumerate(zip(photo_data, text_tokens)):
+        for token in tokenize(item["title"]).union(extra):
+            postings.setdefault(token, []).append(doc_id)
+    index = {
+        "prefix_limit": SEARCH_PREFIX_LIMIT,
+        "docs": [[item["title"], item["pdf"]] for item in photo_data],
+        "tokens": {token: postings[token] for token in sorted(postings)}
+    }
+    output_path = os.path.join(GALLERY_DIR, SEARCH_INDEX)
+    with open(output_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    record_bytes(written=os.path.getsize(output_path + ".tmp"))
+    os.replace(output_path + ".tmp", output_path)
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="生成PDF和照片画廊")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="忽略构建清单，重新生成所有缩略图、复制所有PDF并重写所有页面")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="生成缩略图的并行进程数，1 为串行，0 为使用全部CPU核心（默认: 1）")
+    parser.add_argument("--resample", choices=sorted(RESAMPLE_FILTERS), default=THUMBNAIL_RESAMPLE,
+                        help=f"缩略图最终缩放使用的重采样滤镜（默认: {THUMBNAIL_RESAMPLE}）")
+    parser.add_argument("--max-decode-pixels", type=int, default=MAX_DECODE_PIXELS,
+                        help="无法缩小解码的图片（PNG、WebP 等）允许的最大像素数，超过时跳过该图片以限制内存峰值；"
+                             f"JPEG 按缩小解码后的尺寸判断；0 表示不限制（默认: {MAX_DECODE_PIXELS}）")
+    parser.add_argument("--publish", choices=sorted(PUBLISH_FALLBACKS), default=PDF_PUBLISH_STRATEGY,
+                        help="PDF发布方式，不受支持时自动回退为复制（默认: copy）")
+    parser.add_argument("--page-size", type=int, default=0,
+                        help="每页卡片数，写出 index.html、page-2.html……；0 表示全部放在一页（默认: 0）")
+    parser.add_argument("--infinite-scroll", action="store_true",
+                        help="只渲染首批卡片，其余卡片由浏览器读取 JSON 清单按需加载")
+    parser.add_argument("--search-pdf-text", action="store_true",
+                        help="把PDF前几页的正文加入搜索索引（需要安装 pypdf）")
+    parser.add_argument("--pdf-covers", action="store_true",
+                        help="为没有照片的PDF渲染第1页作为封面（需要 PyMuPDF、pypdfium2、pdftoppm 或 mutool）")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="缩略图、PDF和样式表使用带内容哈希的文件名（如 name.3f9a1c2b.pdf），便于长期缓存")
+    parser.add_argument("--duplicates", choices=DUPLICATE_MODES, default=DUPLICATE_MODE,
+                        help="按感知哈希检测相似照片：off 不检测，report 只报告，"
+                             f"collapse 每组中PDF相同的项目只保留分辨率最高的一张（默认: {DUPLICATE_MODE}）")
+    parser.add_argument("--site-url", default=None, metavar="URL",
+                        help=f"站点根地址（如 https://example.com/gallery/），指定时生成 {SITEMAP}")
+    parser.add_argument("--precompress", action="store_true",
+                        help="为页面和 JSON 清单生成 .gz（安装 brotli 时还有 .br）预压缩文件")
+    parser.add_argument("--watch", action="store_true",
+                        help="构建后常驻监视 photos/ 和 pdfs/，文件变化时增量重建")
+    parser.add_argument("--watch-interval", type=float, default=WATCH_INTERVAL,
+                        help=f"监视模式的轮询间隔（秒，默认: {WATCH_INTERVAL}）")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE,
+                        help=f"文件停止变化多久后才重建（秒，默认: {WATCH_DEBOUNCE}）")
+    parser.add_argument("--serve", type=int, nargs="?", const=PREVIEW_PORT, default=None, metavar="PORT",
+                        help=f"启动本地静态服务器预览 gallery/（默认端口: {PREVIEW_PORT}）")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"用 cProfile 记录主进程的构建过程，结果保存到 {PROFILE_PATH}")
+    return parser.parse_args(argv)
+
+def build(args):
+    """按命令行参数执行一次完整构建，记录各阶段耗时并写出构建报告"""
+    reset_build_report()
+    start = time.perf_counter()
+    with build_stage("create_directories"):
+        create_directories()
+    with build_stage("process_photos"):
+        photo_data = process_photos(full_rebuild=args.full_rebuild, jobs=args.jobs,
+                                    resample=args.resample, max_pixels=args.max_decode_pixels,
+                                    publish=args.publish, pdf_covers=args.pdf_covers,
+                                    fingerprint=args.fingerprint, duplicates=args.duplicates)
     if not photo_data:
         print("警告: 没有找到可处理的照片和PDF文件")
-    generate_html(photo_data)
-    print(f"画廊生成完成，共处理 {len(photo_data)} 个项目")
+    with build_stage("generate_html"):
+        pages = generate_html(photo_data, page_size=args.page_size, infinite_scroll=args.infinite_scroll,
+                              fingerprint=args.fingerprint, full_rebuild=args.full_rebuild)
+    with build_stage("write_sitemap"):
+        write_sitemap(pages, photo_data, args.site_url)
+    with build_stage("build_search_index"):
+        build_search_index(photo_data, include_pdf_text=args.search_pdf_text)
+    with build_stage("precompress"):
+        precompress_outputs(args.precompress)
+    write_build_report(time.perf_counter() - start, len(photo_data))
+    return photo_data
+
+def compress_file(path):
+    """为文件写出 .gz（及安装 brotli 时的 .br）同名压缩文件，已是最新时跳过"""
+    mtime = os.stat(path).st_mtime_ns
+    targets = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        targets.append((".br", lambda data: brotli.compress(data, quality=11)))
+    data = None
+    for suffix, compress in targets:
+        target = path + suffix
+        if os.path.exists(target) and os.stat(target).st_mtime_ns >= mtime:
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        record_bytes(read=len(data))
+        compressed = compress(data)
+        with open(target + ".tmp", "wb") as f:
+            f.write(compressed)
+        os.replace(target + ".tmp", target)
+        record_bytes(written=len(compressed))
+
+def precompress_outputs(enabled=True):
+    """预压缩 gallery/ 顶层的页面与清单，并删除源文件已不存在（或已关闭预压缩）的压缩文件"""
+    sources = set()
+    with os.scandir(GALLERY_DIR) as entries:
+        names = [entry.name for entry in entries if entry.is_file()]
+    for name in names:
+        if name.endswith(PRECOMPRESS_SUFFIXES) and not name.startswith("."):
+            sources.add(name)
+            if enabled:
+                compress_file(os.path.join(GALLERY_DIR, name))
+    for name in names:
+        base, suffix = os.path.splitext(name)
+        if suffix in PRECOMPRESS_ENCODINGS and base.endswith(PRECOMPRESS_SUFFIXES):
+            if not enabled or base not in sources:
+                os.remove(os.path.join(GALLERY_DIR, name))
+
+def snapshot_sources():
+    """记录 photos/、pdfs/（含一级子目录）、模板目录和元数据文件中每个文件的大小与修改时间"""
+    state = {}
+    for path in METADATA_FILES:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        state[path] = (st.st_size, st.st_mtime_ns)
+    pending = [(PHOTO_DIR, True), (PDF_DIR, True), (TEMPLATE_DIR, False)]
+    while pending:
+        directory, subfolders = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    state[entry.path] = (st.st_size, st.st_mtime_ns)
+                elif subfolders and entry.is_dir() and not entry.name.startswith("."):
+                    pending.append((entry.path, False))
+    return state
+
+def wait_for_changes(previous, interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE):
+    """轮询直到源文件发生变化，并等待变化停止 debounce 秒后返回新的快照"""
+    while True:
+        time.sleep(interval)
+        current = snapshot_sources()
+        if current != previous:
+            break
+    # 去抖：批量拷入文件时会连续变化，等到一段时间内没有新变化再重建
+    settled_at = time.monotonic()
+    while time.monotonic() - settled_at < debounce:
+        time.sleep(min(interval, debounce))
+        latest = snapshot_sources()
+        if latest != current:
+            current = latest
+            settled_at = time.monotonic()
+    return current
+
+def watch(args):
+    """常驻监视源文件，变化后增量重建
+
+    进程常驻使模板、卡片缓存和进程池在多次重建之间保持可用；重建本身依靠
+    构建清单只处理变化的缩略图和PDF。
+    """
+    args.full_rebuild = False
+    snapshot = snapshot_sources()
+    print(f"正在监视 {PHOTO_DIR}/ 和 {PDF_DIR}/ 的变化，按 Ctrl+C 退出")
+    while True:
+        current = wait_for_changes(snapshot, args.watch_interval, args.debounce)
+        changed = sum(1 for path in set(current) | set(snapshot) if current.get(path) != snapshot.get(path))
+        print(f"检测到文件变化（{changed} 处），开始增量重建...")
+        snapshot = current
+        try:
+            photo_data = build(args)
+        except Exception as e:
+            print(f"重建失败: {e}")
+            continue
+        print(f"重建完成，共 {len(photo_data)} 个项目")
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """不输出访问日志的静态文件处理器"""
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_gallery(port=PREVIEW_PORT):
+    """在后台线程中启动只监听本机的静态服务器，用于预览 gallery/"""
+    handler = functools.partial(_QuietHandler, directory=os.path.abspath(GALLERY_DIR))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"预览地址: http://127.0.0.1:{port}/")
+    return server
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("开始生成PDF和照片画廊...")
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    server = None
+    try:
+        try:
+            photo_data = build(args)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(PROFILE_PATH)
+                print(f"性能分析数据已保存到 {PROFILE_PATH}")
+        print(f"画廊生成完成，共处理 {len(photo_data)} 个项目")
+        if args.serve is not None:
+            server = serve_gallery(args.serve)
+        if args.watch:
+            watch(args)
+        elif server:
+            print("按 Ctrl+C 停止预览")
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        print("已停止")
+    finally:
+        if server:
+            server.shutdown()
+        shutdown_process_pools()
 
 if __name__ == "__main__":
     main()